@@ -109,6 +109,11 @@
         call the function:
             stop_actor(acid)
             
+        A group of actors (a cast) can be started at once with the function:
+            start_actors(specs, max_parallel)
+        which logs in the VR avatars concurrently and returns the result of
+        each actor.
+            
         Additional information about VirtualStage actor can be obtained with 
         functions:
             print_version()
@@ -124,8 +129,8 @@
         call the following function:        
             start_script(acid, script, scriptargs)
         
-        This function will start a new actor script running on a new Python 
-        thread and return the unique identifier of the script. The script 
+        This function will start a new actor script running on the script pool
+        of the stage and return the unique identifier of the script. The script 
         argument references a callable Python function, which implements the 
         script. This function has the following arguments:
             acid: a string with the unique global identifier of new actor.
@@ -135,11 +140,39 @@
         To wait for the script identified by scriptid to finish is necessary
         to call the function:
             wait_script_finish(acid, scriptid, timeout=None)
-        This function uses join() to wait for corresponding thread to terminates.
+            
+        The script pool runs at most ScriptPoolSize scripts at the same time
+        (see set_script_pool_size()), scripts started when all threads of 
+        the pool are busy run in a dedicated thread, out of the pool, so 
+        they never wait for long-running scripts. Function submit_script() 
+        also starts a
+        script, but returns a Future handle (see concurrent.futures), which
+        gives access to result and exception of the script. Finished scripts 
+        are pruned automatically. See also functions:
+            get_script_handle(acid, scriptid)
+            get_running_scripts(acid)
+            
+        Each script has a cancellation token and can have a deadline (the 
+        timeout arg of start_script()). When a script is cancelled (see
+        cancel_script()), reaches its deadline or its actor is stopped, all 
+        waits of the script return immediately. Scripts with loops must 
+        check script_cancelled(acid) to finish. See also functions:
+            sleep_script(acid, seconds)
+            get_script_token(acid)
+            
+        Actors can also be driven from an asyncio event loop, using the 
+        coroutines:
+            async_wait_vrmsg(acid, msgpatt, timeout)
+            async_wait_vrevnt(acid, evntpatt, timeout)
+            async_wait_comm(acid, srcacids, commpatt, timeout)
+            async_action(acid, action, *args)
+        The waits are fed by the event pump without using threads, blocking
+        actions are run by async_action() in a pool of AsyncPoolSize threads.
         
     3)  The ActorController module also implements the inter-actor (non VR) 
         communication functions:
             wait_comm(acid, srcacids, commpatt, timeout)
+            wait_comms(acid, srcacids, commpatt, timeout, max_batch)
             send_comm(acid, dstacids, type, content, slots)
             seek_comms(acid, srcacids, commpatt)
             clear_comms(acid)
@@ -147,13 +180,56 @@
         These functions can be used to send and receive communications between 
         actors running in the same instance of VirtualStage. Communications
         are messages exchanged between actors that do not pass trough the VR 
-        simulator. They are composed by lists of strings with the format:
-            [comtype, acid, content, acname, slots]
+        simulator. They are composed by immutable sequences of strings (CommMsg
+        tuples) with the format:
+            (comtype, acid, content, acname, slots)
         where comtype identifies the type (or code) of the comm. message, 
         acid and acname are, respectivelly, the unique ID and the name of the
         actor that sent this message, content is the text of the comm. message 
-        and slots is a list of strings with additional comm. message fields
-        (slots can be None).
+        and slots is a tuple of strings with additional comm. message fields
+        (slots can be None). The same comm. message is shared by all actors 
+        that receive it, so it cannot be modified (use list(comm) to get a 
+        modifiable copy).
+        
+        Communications can also be broadcast through named channels: actors
+        subscribe to channels with a filter pattern and receive only the
+        comms published in these channels that match their filter:
+            subscribe_channel(acid, channel, commpatt)
+            unsubscribe_channel(acid, channel)
+            publish_comm(acid, channel, comtype, content, slots)
+            get_channel_subscribers(channel)
+        
+        Actors can also call operations of other actors (request/reply), 
+        handlers of operations are registered by the called actor and run
+        on the call pool, many calls can be outstanding at the same time:
+            register_call_handler(acid, op, handler)
+            call_actor(acid, dstacid, op, args, timeout)
+            start_call(acid, dstacid, op, args)
+            get_call_stats(acid)
+        
+        Communications can be sent to actors running in other VirtualStage
+        processes on the same host, after a comm transport is set (see the
+        StageTransport module):
+            set_comm_transport(transport)
+            
+        Communications, VR messages and VR events received by an actor, but 
+        not yet consumed by its scripts, are stored in bounded mailboxes. The
+        limits and statistics of these mailboxes are managed by functions:
+            set_mailbox_limits(acid, capacity, policy, ttl, mailbox)
+            set_default_mailbox_limits(capacity, policy, ttl)
+            get_mailbox_stats(acid)
+        
+        Latency and throughput metrics of actors (mailboxes, waits, event 
+        pump and comms) can be obtained and periodically dumped to a JSON 
+        lines file with functions:
+            get_actor_metrics(acid)
+            get_stage_metrics()
+            start_metrics_dump(path, period, peractor)
+            stop_metrics_dump()
+        
+        Search patterns used by functions that wait or seek communications,
+        VR messages and VR events can be compiled once by function:
+            compile_pattern(msgpatt)
         
     4)  The DialogController Module implements the Near Natural Language (NNL) 
         dialog system, which supports several forms of conversations and chats 
@@ -206,7 +282,14 @@ import clr
 #from System import String
 #from System.Collections import *
 import threading
+import contextvars
+import concurrent.futures
+import asyncio
+import traceback
 import queue
+import heapq
+import bisect
+import json
 import re
 import os
 clr.AddReference("bin\\VRAgents")
@@ -228,6 +311,63 @@ from SystemActions import *
 
 VirtualStage_Version = "0.7.0"
 
+#*******************************************
+# EVENT PUMP CONFIGURATION
+
+# Number of worker threads of the event pump, which is shared by all
+# actors of the stage
+EvPumpThreads = 2
+# Period (in seconds) between each check of new VR msgs/events, used only
+# when VR actor controller cannot notify the arrival of new inbound data
+EvPollPeriod = 0.3
+# Max time (in seconds) an actor stays without being checked by the event 
+# pump, even if VR actor controller did not notify new inbound data
+EvIdleTimeout = 1.0
+
+#*******************************************
+# MAILBOXES CONFIGURATION
+
+# Default max number of items stored in each mailbox of an actor (VR msgs,
+# VR events and actor comms), None means unbounded mailboxes
+MailboxCapacity = 1000
+# Default policy used when a mailbox is full: 'drop-oldest', 'drop-newest'
+# or 'coalesce' (keep only the last item of the same type and sender)
+MailboxPolicy = 'drop-oldest'
+# Default max time (in seconds) an item stays in a mailbox before it 
+# expires, None means that items do not expire
+MailboxTTL = None
+MailboxPolicies = ('drop-oldest','drop-newest','coalesce')
+
+#*******************************************
+# SCRIPT POOL CONFIGURATION
+
+# Max number of secondary scripts (started by start_script()) running at 
+# the same time in the script pool of the stage, other scripts run in 
+# dedicated threads (one per script) until some thread of the pool is free
+ScriptPoolSize = 64
+
+# Max time in seconds stop_actor() waits for cancelled scripts to finish
+StopScriptsTimeout = 5.0
+
+# Max number of blocking actions (VR actions, dialog processing, etc.) 
+# offloaded by the asyncio facade running at the same time
+AsyncPoolSize = 32
+
+# Max number of call handlers (of start_call() and call_actor()) running at
+# the same time in the stage, other calls wait in queue for a free thread
+CallPoolSize = 32
+
+# Default max time in seconds call_actor() waits for the result of a call
+CallTimeout = 60.0
+
+#*******************************************
+# METRICS CONFIGURATION
+
+# Upper bounds of buckets of latency histograms (in seconds) and of count 
+# histograms (number of items or waiters scanned)
+LatencyBuckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+CountBuckets = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
 #*******************************************
 # DEBUG FUNCTIONS
 
@@ -279,12 +419,392 @@ class WaiterDescr:
         self.signalpyev.clear()
         self.obj = None
 
+#*******************************************
+# SCRIPT CANCELLATION TOKEN
+#
+# Each script has a token that is cancelled when the script (or its actor) 
+# is stopped and that can have a deadline. Blocking primitives check the 
+# token of the current script: waits end when the token is cancelled and
+# never last beyond the deadline of the script. Tokens of secondary scripts
+# are children of the token of the actor, so cancelling the actor token 
+# cancels all scripts of the actor.
+
+class ScriptToken:
+    """__init__() class constructor"""
+    def __init__(self, acid, parent=None, timeout=None):
+        self.lock = threading.Lock()
+        self.acid = acid
+        self.cancelev = threading.Event()
+        self.parent = parent
+        if timeout==None:
+            self.deadline = None
+        else:
+            self.deadline = time.monotonic()+timeout
+        self.signals = []
+        self.children = set()
+        if parent!=None:
+            parent._addChild(self)
+
+    def cancel(self):
+        """ Cancel the token, waking up every wait that uses it """
+        with self.lock:
+            self.cancelev.set()
+            signals = list(self.signals)
+            children = list(self.children)
+        for signal in signals:
+            signal.set()
+        for child in children:
+            child.cancel()
+
+    def cancelled(self):
+        """ Returns True if the token was cancelled or its deadline passed """
+        if self.cancelev.is_set():
+            return True
+        return self.deadline!=None and time.monotonic()>=self.deadline
+
+    def remaining(self, timeout=None):
+        """ Returns the time to wait, limited by timeout and by the deadline
+            of the token, or None to wait indefinitely """
+        if self.cancelev.is_set():
+            return 0
+        if self.deadline!=None:
+            left = max(0.0,self.deadline-time.monotonic())
+            if timeout==None or left<timeout:
+                return left
+        return timeout
+
+    def sleep(self, seconds):
+        """ Sleep for seconds, returns False if the token was cancelled or 
+            its deadline passed before the end of the sleep """
+        self.cancelev.wait(self.remaining(seconds))
+        return not self.cancelled()
+
+    def _addChild(self, child):
+        with self.lock:
+            self.children.add(child)
+            cancelled = self.cancelev.is_set()
+        if cancelled:
+            child.cancel()
+
+    def _removeChild(self, child):
+        with self.lock:
+            self.children.discard(child)
+
+    def _addSignal(self, signal):
+        with self.lock:
+            self.signals.append(signal)
+            cancelled = self.cancelev.is_set()
+        if cancelled:
+            signal.set()
+
+    def _removeSignal(self, signal):
+        with self.lock:
+            if signal in self.signals:
+                self.signals.remove(signal)
+
+#*******************************************
+# METRICS OBJECTS
+#
+# Histograms keep the number of observed values in fixed buckets, the sum
+# and the max of values. Actor metrics are updated with actor.lock acquired
+# (except pump metrics, updated only by the pump thread handling the actor).
+
+class Histogram:
+    """__init__() class constructor"""
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0]*(len(bounds)+1)
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+
+    def observe(self, val):
+        self.counts[bisect.bisect_left(self.bounds,val)] += 1
+        self.count += 1
+        self.total += val
+        if self.max==None or val>self.max:
+            self.max = val
+
+    def merge(self, other):
+        for i,cnt in enumerate(other.counts):
+            self.counts[i] += cnt
+        self.count += other.count
+        self.total += other.total
+        if other.max!=None and (self.max==None or other.max>self.max):
+            self.max = other.max
+
+    def percentile(self, q):
+        # Upper bound of the bucket containing the q percentile
+        if self.count==0:
+            return None
+        limit = q*self.count
+        cumul = 0
+        for i,cnt in enumerate(self.counts):
+            cumul += cnt
+            if cumul>=limit and cnt>0:
+                return self.bounds[i] if i<len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self):
+        bounds = list(self.bounds)+['inf']
+        return {'count':self.count, 
+                'avg':self.total/self.count if self.count>0 else None,
+                'max':self.max, 'p50':self.percentile(0.5), 
+                'p95':self.percentile(0.95),
+                'buckets':[[le,cnt] for le,cnt in zip(bounds,self.counts)]}
+
+class ActorMetrics:
+    """__init__() class constructor"""
+    def __init__(self):
+        self.waits = 0
+        self.waittimeouts = 0
+        self.waittime = Histogram(LatencyBuckets)
+        self.waiterscan = Histogram(CountBuckets)
+        self.pumpruns = 0
+        self.pumptime = Histogram(LatencyBuckets)
+        self.vrmsgsrcvd = 0
+        self.vrevntsrcvd = 0
+        self.commsrcvd = 0
+        self.commssent = 0
+
+#*******************************************
+# MAILBOX OBJECT
+#
+# Mailboxes store VR msgs, VR events or actor comms received by an actor,
+# in arrival order. They are indexed by field 0 (type of msg/event/comm)
+# and, optionally, by the field with the ID of the sender (field 3 for 
+# VR msgs and field 1 for actor comms). Items are removed in O(1).
+#
+# Mailboxes can be bounded by a capacity, applying a policy to choose 
+# which item is dropped when full, and by a time to live (ttl) of items.
+# Counters of dropped, expired and delivered items are kept.
+
+class Mailbox:
+    """__init__() class constructor"""
+    def __init__(self, senderfld=None, capacity=None, policy='drop-oldest', ttl=None):
+        self.senderfld = senderfld
+        self.capacity = capacity
+        self.policy = policy
+        self.ttl = ttl
+        self.nextseq = 0
+        self.items = {}
+        self.arrivals = {}
+        self.bytype = {}
+        self.bysender = {}
+        self.dropped = 0
+        self.expired = 0
+        self.delivered = 0
+        self.maxsize = 0
+        self.enqtimes = {}
+        self.latency = Histogram(LatencyBuckets)
+        self.scanned = Histogram(CountBuckets)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(list(self.items.values()))
+
+    def append(self, item):
+        # Store the item in mailbox, returns None if the item was dropped
+        self.expire()
+        if self.policy=='coalesce':
+            # Drop the previous item of same type and sender (if any)
+            for seq in self._sameTypeAndSender(item):
+                self.remove(seq)
+                self.dropped += 1
+        if self.capacity!=None and len(self.items)>=self.capacity:
+            if self.policy=='drop-newest':
+                self.dropped += 1
+                return None
+            while len(self.items)>=self.capacity and len(self.items)>0:
+                self.remove(next(iter(self.items)))
+                self.dropped += 1
+            if self.capacity<=0:
+                self.dropped += 1
+                return None
+        seq = self.nextseq
+        self.nextseq += 1
+        self.items[seq] = item
+        now = time.monotonic()
+        self.enqtimes[seq] = now
+        if self.ttl!=None:
+            self.arrivals[seq] = now
+        if len(self.items)>self.maxsize:
+            self.maxsize = len(self.items)
+        self.bytype.setdefault(_fieldKey(item,0),{})[seq] = None
+        if self.senderfld!=None:
+            self.bysender.setdefault(_fieldKey(item,self.senderfld),{})[seq] = None
+        return seq
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def remove(self, seq):
+        item = self.items.pop(seq)
+        self.arrivals.pop(seq,None)
+        self.enqtimes.pop(seq,None)
+        _unindex(self.bytype,_fieldKey(item,0),seq)
+        if self.senderfld!=None:
+            _unindex(self.bysender,_fieldKey(item,self.senderfld),seq)
+        return item
+
+    def clear(self):
+        self.items.clear()
+        self.arrivals.clear()
+        self.enqtimes.clear()
+        self.bytype.clear()
+        self.bysender.clear()
+
+    def expire(self):
+        # Items are stored in arrival order, so expired items are the first
+        if self.ttl==None or len(self.arrivals)==0:
+            return
+        limit = time.monotonic()-self.ttl
+        for seq in list(self.arrivals.keys()):
+            if self.arrivals[seq]>limit:
+                break
+            self.remove(seq)
+            self.expired += 1
+
+    def set_limits(self, capacity, policy, ttl):
+        self.capacity = capacity
+        self.policy = policy
+        if ttl!=None and self.ttl==None:
+            # Items stored before the ttl was set expire from now on
+            now = time.monotonic()
+            for seq in self.items:
+                self.arrivals[seq] = now
+        elif ttl==None:
+            self.arrivals.clear()
+        self.ttl = ttl
+        self.expire()
+        while self.capacity!=None and len(self.items)>self.capacity:
+            if self.policy=='drop-newest':
+                self.remove(next(reversed(self.items)))
+            else:
+                self.remove(next(iter(self.items)))
+            self.dropped += 1
+
+    def stats(self):
+        return {'size':len(self.items), 'capacity':self.capacity, 
+                'policy':self.policy, 'ttl':self.ttl, 'dropped':self.dropped,
+                'expired':self.expired, 'delivered':self.delivered}
+
+    def metrics(self):
+        return {'size':len(self.items), 'maxsize':self.maxsize, 
+                'dropped':self.dropped, 'expired':self.expired, 
+                'delivered':self.delivered, 'latency':self.latency.snapshot(),
+                'scanned':self.scanned.snapshot()}
+
+    def deliver_direct(self):
+        # Item delivered to a waiter without being stored in mailbox
+        self.delivered += 1
+        self.latency.observe(0.0)
+
+    def _deliver(self, seq):
+        self.delivered += 1
+        self.latency.observe(time.monotonic()-self.enqtimes.get(seq,time.monotonic()))
+        return self.remove(seq)
+
+    def _sameTypeAndSender(self, item):
+        bucket = self.bytype.get(_fieldKey(item,0))
+        if bucket==None:
+            return []
+        if self.senderfld==None:
+            return list(bucket.keys())
+        sender = _fieldKey(item,self.senderfld)
+        return [seq for seq in bucket if _fieldKey(self.items[seq],self.senderfld)==sender]
+
+    def _candidates(self, cpatt, sources):
+        # Select the index buckets which can contain items matching the 
+        # pattern or the sources. Only the keys of the index are tested 
+        # against the pattern, not the items. If neither field 0 nor the 
+        # sender field is fixed, all items are candidates.
+        selections = []
+        typepred = cpatt.field_pred(0)
+        if typepred!=None:
+            selections.append([bucket for key,bucket in self.bytype.items()
+                                if typepred(key)])
+        if self.senderfld!=None:
+            senderpred = cpatt.field_pred(self.senderfld)
+            if sources!=None:
+                if type(sources) is not list:
+                    sources = [sources]
+                selections.append([self.bysender[src] for src in sources 
+                                    if src in self.bysender])
+            elif senderpred!=None:
+                selections.append([bucket for key,bucket in self.bysender.items()
+                                    if senderpred(key)])
+        if len(selections)==0:
+            return list(self.items.keys())
+        # Use the most selective index, merging its buckets in arrival order
+        buckets = min(selections, key=lambda bkts: sum(len(b) for b in bkts))
+        if len(buckets)==1:
+            return list(buckets[0].keys())
+        return list(heapq.merge(*[list(b.keys()) for b in buckets]))
+
+    def find(self, patt, sources=None, maxitems=None):
+        # Return the seqs of items matching pattern and sources, in 
+        # arrival order
+        self.expire()
+        cpatt = compile_pattern(patt)
+        found = []
+        scanned = 0
+        for seq in self._candidates(cpatt,sources):
+            scanned += 1
+            item = self.items[seq]
+            if _matchSources(sources,item) and cpatt.match(item):
+                found.append(seq)
+                if maxitems!=None and len(found)>=maxitems:
+                    break
+        self.scanned.observe(scanned)
+        return found
+
+    def take_first(self, patt, sources=None):
+        found = self.find(patt,sources,1)
+        if len(found)==0:
+            return None
+        return self._deliver(found[0])
+
+    def take_all(self, patt, sources=None, maxitems=None):
+        found = self.find(patt,sources,maxitems)
+        return [self._deliver(seq) for seq in found]
+
+def _fieldKey(item,fld):
+    try:
+        key = item[fld]
+        hash(key)
+        return key
+    except:
+        return None
+
+def _unindex(index,key,seq):
+    bucket = index.get(key)
+    if bucket==None:
+        return
+    bucket.pop(seq,None)
+    if len(bucket)==0:
+        del index[key]
+
 #*******************************************
 # VR ACTOR DESCRIPTOR OBJECT
 
+class CallStats:
+    """__init__() class constructor"""
+    def __init__(self):
+        self.calls = 0
+        self.ok = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.totlatency = 0.0
+        self.maxlatency = 0.0
+        self.lastlatency = None
+
 class ActorDescriptor:
     """__init__() class constructor"""
-    def __init__(self, active, id, name, avfstname, avlstname, simurl, agctl, mainthr, evthr):
+    def __init__(self, active, id, name, avfstname, avlstname, simurl, agctl, mainthr):
         self.lock = threading.Lock()
         self.active = active
         self.id = id
@@ -294,104 +814,480 @@ class ActorDescriptor:
         self.simurl = simurl
         self.agctl = agctl
         self.mainthr = mainthr
-        self.evthr = evthr
-        self.vrmsgs = []
-        self.vrevnts = []
-        self.acmsgs = []
-        self.waiter_vrmsg = WaiterDescr()
-        self.waiter_vrevnt = WaiterDescr()
-        self.waiter_agmsg = WaiterDescr()
-        self.secthrds = []
+        self.vrmsgs = Mailbox(3,MailboxCapacity,MailboxPolicy,MailboxTTL)
+        self.vrevnts = Mailbox(None,MailboxCapacity,MailboxPolicy,MailboxTTL)
+        self.acmsgs = Mailbox(1,MailboxCapacity,MailboxPolicy,MailboxTTL)
+        self.waiters_vrmsg = []
+        self.waiters_vrevnt = []
+        self.waiters_agmsg = []
+        self.scripts = {}
+        self.nextscriptid = 0
+        self.token = ScriptToken(id)
+        self.callhandlers = {}
+        self.callstats = CallStats()
+        self.nextcallid = 0
+        self.metrics = ActorMetrics()
+        self.inboundhnd = None
+        self.pumplock = threading.Lock()
+        self.pumppending = False
+        self.pumpqueued = False
+        self.pumpidle = threading.Event()
+        self.pumpidle.set()
+        self.lastpump = 0.0
 
 #*******************************************
 # ACTOR DESCRIPTORS TABLE
 
+# ActorsTbl is never modified in place: each time an actor is started or 
+# stopped a new copy of the table is built and replaces the old one, while
+# holding ActorsTblLock (copy-on-write). So, lookups in ActorsTbl do not
+# need to acquire ActorsTblLock, only start/stop of actors are serialized.
+
 ActorsTblLock = threading.Lock()
 ActorsTbl = {}
 
+def _getActor(acid):
+    return ActorsTbl.get(acid)
+
+#*******************************************
+# CURRENT ACTOR BINDING
+#
+# Each script thread (initial or secondary) is bound to its actor and to
+# its cancellation token when it starts, so the actor running the current
+# script is found in O(1). The initial script uses the token of the actor.
+
+CurrActorId = contextvars.ContextVar('CurrActorId', default=None)
+CurrScriptToken = contextvars.ContextVar('CurrScriptToken', default=None)
+
+def _runActorScript(acid, script, scriptargs, token=None):
+    if token==None:
+        actor = _getActor(acid)
+        if actor!=None:
+            token = actor.token
+    acidctx = CurrActorId.set(acid)
+    tokenctx = CurrScriptToken.set(token)
+    try:
+        return script(*scriptargs)
+    finally:
+        CurrScriptToken.reset(tokenctx)
+        CurrActorId.reset(acidctx)
+
+def _currToken(actor):
+    # Token of the current script, only if the script belongs to the actor
+    token = CurrScriptToken.get()
+    if token==None or token.acid!=actor.id:
+        return None
+    return token
+
+def _addActor(actor):
+    # Must be called with ActorsTblLock acquired
+    global ActorsTbl
+    newtbl = dict(ActorsTbl)
+    newtbl[actor.id] = actor
+    ActorsTbl = newtbl
+
+def _addActors(actors):
+    # Must be called with ActorsTblLock acquired, adds all actors at once
+    global ActorsTbl
+    newtbl = dict(ActorsTbl)
+    for actor in actors:
+        newtbl[actor.id] = actor
+    ActorsTbl = newtbl
+
+def _removeActor(acid):
+    # Must be called with ActorsTblLock acquired
+    global ActorsTbl
+    newtbl = dict(ActorsTbl)
+    newtbl.pop(acid,None)
+    ActorsTbl = newtbl
+
+#*******************************************
+# INBOUND DATA NOTIFICATION FUNCTIONS
+#*******************************************
+
+def _signalInbound(actor):
+    # Schedule the actor to be handled by the event pump, because there 
+    # is new inbound data (VR msgs/events or actor comms) to be handled.
+    # If the actor is already scheduled (or being handled) only marks 
+    # that it must be handled again.
+    with actor.pumplock:
+        actor.pumppending = True
+        if actor.pumpqueued:
+            return
+        actor.pumpqueued = True
+        actor.pumpidle.clear()
+    _startEventPump()
+    EvPump.readyq.put(actor)
+
+def _attachInboundHandler(actor):
+    # Ask the VR actor controller to notify the arrival of new VR msgs
+    # and events. Older builds of VRAgents.dll do not raise this .NET
+    # event, in this case the event pump will poll the controller
+    def inboundHandler(sender, args):
+        _signalInbound(actor)
+    try:
+        actor.agctl.InboundArrived += inboundHandler
+        actor.inboundhnd = inboundHandler
+        return True
+    except:
+        actor.inboundhnd = None
+        return False
+
+def _detachInboundHandler(actor):
+    if actor.inboundhnd==None:
+        return
+    try:
+        actor.agctl.InboundArrived -= actor.inboundhnd
+    except:
+        pass
+    actor.inboundhnd = None
+
 #*******************************************
 # EVENT/MESSAGE MATCHING FUNCTIONS
 #*******************************************
 
-def _compareEvOrMsgStr(patt,val):
-#   print_dbg('ac','_compareEvOrMsgStr("',patt.casefold(),'","',val.casefold(),'")')
-    if patt.find("|")>0:
-        pattlist = patt.split("|")
-        for spatt in pattlist:
-            if val.casefold().find(spatt.casefold())>=0:
+# VR messages received from VR actor controller are stored as VRMsg objects, 
+# which are lists (so fields are still accessed as msg[2]) that also cache
+# the casefolded value of its fields, computed only when first needed.
+
+class VRMsg(list):
+    __slots__ = ('cffields',)
+
+    def __setitem__(self, index, value):
+        list.__setitem__(self, index, value)
+        self.cffields = None
+
+    def casefold_field(self, fld):
+        # Returns the casefolded value of field fld, caching it
+        try:
+            cffields = self.cffields
+        except AttributeError:
+            cffields = None
+        if cffields==None or len(cffields)!=len(self):
+            cffields = [None]*len(self)
+            self.cffields = cffields
+        cfval = cffields[fld]
+        if cfval==None:
+            cfval = self[fld].casefold()
+            cffields[fld] = cfval
+        return cfval
+
+# Comms sent between actors are CommMsg objects, immutable tuples with the
+# fields (comtype, acid, content, acname, slots), where slots is also a
+# tuple. The same CommMsg is shared, without copying, by all actors that 
+# receive it, so no receiver can change the comm seen by the others.
+
+class CommMsg(tuple):
+    __slots__ = ()
+
+    def __new__(cls, comtype, acid, content, acname, slots):
+        if isinstance(slots,list):
+            slots = tuple(slots)
+        return tuple.__new__(cls,(comtype,acid,content,acname,slots))
+
+    comtype = property(lambda self: self[0])
+    acid = property(lambda self: self[1])
+    content = property(lambda self: self[2])
+    acname = property(lambda self: self[3])
+    slots = property(lambda self: self[4])
+
+    def __getnewargs__(self):
+        # Allows comms to be pickled (e.g. by comm transports)
+        return tuple(self)
+
+# Patterns of VR msgs, VR events and actor comms are compiled to MsgPattern
+# objects, which hold one predicate for each field of the pattern. Pattern
+# strings are parsed only once and its literals are already casefolded. 
+
+class MsgPattern:
+    """__init__() class constructor"""
+    def __init__(self, msgpatt):
+        self.pattern = msgpatt
+        self.fieldpreds = {}
+        if type(msgpatt) is list:
+            # Each field is compiled to (index, isstr, pred), if isstr is 
+            # True then pred receives the casefolded field value
+            self.fields = []
+            for i,fldpatt in enumerate(msgpatt):
+                if fldpatt==None:
+                    continue
+                if type(fldpatt) is str:
+                    self.fields.append((i,True,_compileFoldedStr(fldpatt)))
+                else:
+                    self.fields.append((i,False,_compileElem(fldpatt)))
+                self.fieldpreds[i] = _compileElem(fldpatt)
+            self.minlen = len(msgpatt)
+            self.elempred = None
+        else:
+            self.fields = None
+            self.minlen = 0
+            if msgpatt==None:
+                self.elempred = None
+            else:
+                self.elempred = _compileElem(msgpatt)
+
+    def match(self, val):
+        try:
+            if self.fields!=None:
+                if not isinstance(val,(list,CommMsg)) or len(val)<self.minlen:
+                    return False
+                # VR messages cache the casefolded value of their fields
+                cffields = None
+                if type(val) is VRMsg:
+                    try:
+                        cffields = val.cffields
+                    except AttributeError:
+                        pass
+                    if cffields is None or len(cffields)!=len(val):
+                        cffields = [None]*len(val)
+                        val.cffields = cffields
+                for i,isstr,pred in self.fields:
+                    fldval = val[i]
+                    if isstr:
+                        if type(fldval) is not str:
+                            return False
+                        if cffields is not None:
+                            cfval = cffields[i]
+                            if cfval is None:
+                                cfval = fldval.casefold()
+                                cffields[i] = cfval
+                            fldval = cfval
+                        else:
+                            fldval = fldval.casefold()
+                    if not pred(fldval):
+                        return False
                 return True
-        return False
-    
-    if len(patt)<3:
-        if patt.casefold()!=val.casefold(): 
-            return False
-    elif patt[0]=='^' and patt[-1]=='$':
-        if patt[1:-1].casefold()!=val.casefold(): 
-            return False
-    elif patt[0]=='^':
-        if not val.casefold().startswith(patt[1:].casefold()):
-            return False
-    elif patt[-1]=='$':
-        if not val.casefold().endswith(patt[:-1].casefold()):
-            return False
-    elif patt[0]=='!':
-        if val.casefold().find(patt[1:].casefold())>=0:
+            if self.elempred==None:
+                return True
+            if isinstance(val,(list,CommMsg)):
+                return False
+            return self.elempred(val)
+        except:
             return False
-    elif val.casefold().find(patt.casefold())<0:
-        return False
-    return True
 
-def _compareEvOrMsgComp(patt,val):
-    if type(patt) is str and type(val) is str:
-#   if type(patt) is str:
-        if not _compareEvOrMsgStr(patt,val):
-#           print_dbg('ac','_compareEvOrMsgStr=False')
-            return False
-    elif type(patt)!=type(val):
-        return False
-    elif patt!=val:
-        return False
-    return True
+    def field_pred(self, fld):
+        # Returns the predicate for field fld, or None if field is not fixed
+        return self.fieldpreds.get(fld)
 
-def _compareEvOrMsgElem(patt,val):
-    if type(patt) is tuple and type(val) is tuple:
-#   if type(patt) is tuple:
-        if len(patt)>len(val):
+def _compileFoldedStr(patt):
+    # The predicate returned receives an already casefolded value
+    if patt.find("|")>0:
+        alts = [spatt.casefold() for spatt in patt.split("|")]
+        def pred(cfval):
+            for alt in alts:
+                if alt in cfval:
+                    return True
             return False
-        for j in range(len(patt)):
-            if not _compareEvOrMsgComp(patt[j],val[j]):
+        return pred
+    if len(patt)<3:
+        lit = patt.casefold()
+        return lambda cfval: cfval==lit
+    if patt[0]=='^' and patt[-1]=='$':
+        lit = patt[1:-1].casefold()
+        return lambda cfval: cfval==lit
+    if patt[0]=='^':
+        lit = patt[1:].casefold()
+        return lambda cfval: cfval.startswith(lit)
+    if patt[-1]=='$':
+        lit = patt[:-1].casefold()
+        return lambda cfval: cfval.endswith(lit)
+    if patt[0]=='!':
+        lit = patt[1:].casefold()
+        return lambda cfval: lit not in cfval
+    lit = patt.casefold()
+    return lambda cfval: lit in cfval
+
+def _compileStr(patt):
+    pred = _compileFoldedStr(patt)
+    return lambda val: type(val) is str and pred(val.casefold())
+
+def _compileComp(patt):
+    if type(patt) is str:
+        return _compileStr(patt)
+    if type(patt) is list:
+        # Slots of comms are tuples, but can be searched with lists
+        lit = tuple(patt)
+        return lambda val: (type(val) is list or type(val) is tuple) and tuple(val)==lit
+    return lambda val: type(val)==type(patt) and val==patt
+
+def _compileElem(patt):
+    if type(patt) is tuple:
+        comppreds = [_compileComp(comppatt) for comppatt in patt]
+        def pred(val):
+            if type(val) is not tuple or len(patt)>len(val):
                 return False
-    elif type(patt) is str and type(val) is str:
-#   elif type(patt) is str:
-        if not _compareEvOrMsgStr(patt,val):
-#           print_dbg('ac','_compareEvOrMsgStr=False')
-            return False
-    elif type(patt)!=type(val):
-        return False
-    elif patt!=val:
-        return False
-    return True
+            for j,comppred in enumerate(comppreds):
+                if not comppred(val[j]):
+                    return False
+            return True
+        return pred
+    return _compileComp(patt)
+
+PatternCacheSize = 256
+PatternCache = {}
+PatternCacheLock = threading.Lock()
+
+def _patternKey(patt):
+    # Key of a pattern in PatternCache, each value is keyed with its type,
+    # so equal values of different types (like 1, True and 1.0) that would
+    # be compiled to different predicates do not share the same key
+    if type(patt) is list or type(patt) is tuple:
+        return (type(patt),)+tuple(_patternKey(elem) for elem in patt)
+    return (type(patt),patt)
+
+def compile_pattern(msgpatt):
+    """ Compile a search pattern of VR messages, VR events or inter-actor 
+        communications. Compiled patterns are accepted by all functions 
+        that accept search patterns, like wait_vrmsg(), get_vrmsg(), 
+        wait_vrevnt(), wait_comm(), seek_comms(), wait_msg(), etc. Using
+        a compiled pattern avoids parsing the pattern at each match.
+        
+    Args:
+        msgpatt:    the search pattern: a list of fields, each field 
+                    containing a pattern string or the None value (see the 
+                    help of wait_vrmsg() for the rules of pattern strings).
+                    If msgpatt is already compiled, it is returned as is.
 
-def _matchEvOrMsg(patt,val):
+    Returns:     
+        A compiled pattern object, with the method match(msg), which 
+        returns True if msg matches the pattern.
+    """
+    if isinstance(msgpatt,MsgPattern):
+        return msgpatt
+    # Patterns built by the actions library (like wait_chat_inst_msg()) 
+    # are usually the same, so compiled patterns are cached
     try:
-        if patt==None:
-            return True
-        if type(patt) is not list and type(val) is not list:
-#       if type(patt) is not list:
-            return _compareEvOrMsgElem(patt,val)
-        if type(patt) is not list or type(val) is not list:
-            return False
-        if len(patt)>len(val):
-            return False
-        for i in range(len(patt)):
-            if patt[i]!=None:
-                if not _compareEvOrMsgElem(patt[i],val[i]):
-                    return False
+        key = _patternKey(msgpatt)
+        hash(key)
+    except TypeError:
+        return MsgPattern(msgpatt)
+    with PatternCacheLock:
+        cpatt = PatternCache.get(key)
+    if cpatt!=None:
+        return cpatt
+    cpatt = MsgPattern(msgpatt)
+    with PatternCacheLock:
+        if len(PatternCache)>=PatternCacheSize:
+            PatternCache.pop(next(iter(PatternCache)))
+        PatternCache[key] = cpatt
+    return cpatt
+
+
+
+#*******************************************
+# FUNCTIONS TO REGISTER/WAKE UP WAITERS
+#*******************************************
+
+def _matchSources(sources,item):
+    if sources==None:
         return True
-    except:
+    # Only accepts items from a single source actor or from a list of 
+    # source actors, the ID of source actor is in field 1 
+    if type(sources) is not list:
+        return item[1]==sources
+    return item[1] in sources
+
+def _matchWaiter(waiter,item):
+    if not _matchSources(waiter.sources,item):
         return False
+    return waiter.pattern.match(item)
+
+def _deliverToWaiters(waiters,item,metrics):
+    # Match the item against all enabled waiters in a single pass, the 
+    # first waiter (in order of registration) that matches the item
+    # receives it and only this waiter is waked up
+    scanned = 0
+    for waiter in waiters:
+        if waiter.enabled:
+            scanned += 1
+            if _matchWaiter(waiter,item):
+                waiter.obj = item
+                waiter.enabled = False
+                waiter.signalpyev.set()
+                metrics.waiterscan.observe(scanned)
+                return True
+    metrics.waiterscan.observe(scanned)
+    return False
+
+def _newWaiter(pattern,sources=None,signal=None):
+    waiter = WaiterDescr()
+    if signal!=None:
+        waiter.signalpyev = signal
+    waiter.pattern = compile_pattern(pattern)
+    waiter.sources = sources
+    waiter.enabled = True
+    waiter.starttm = time.monotonic()
+    return waiter
+
+def _waitForWaiter(actor,waiters,waiter,timeout):
+    # Wait for the event pump to deliver some item to the waiter, then
+    # remove the waiter from the list of waiters of the actor. The item
+    # is returned even if it was delivered just after the timeout. The
+    # wait ends when the current script is cancelled or reaches its deadline.
+    token = _currToken(actor)
+    if token!=None:
+        timeout = token.remaining(timeout)
+        token._addSignal(waiter.signalpyev)
+    waiter.signalpyev.wait(timeout)
+    if token!=None:
+        token._removeSignal(waiter.signalpyev)
+    return _releaseWaiter(actor,waiters,waiter)
+
+def _releaseWaiter(actor,waiters,waiter):
+    actor.lock.acquire()
+    if waiter in waiters:
+        waiters.remove(waiter)
+    waiter.enabled = False
+    if actor.active:
+        obj = waiter.obj
+    else:
+        obj = None
+    waiter.obj = None
+    metrics = actor.metrics
+    metrics.waits += 1
+    metrics.waittime.observe(time.monotonic()-waiter.starttm)
+    if obj==None:
+        metrics.waittimeouts += 1
+    actor.lock.release()
+    return obj
 
+def _waitBatch(actor,mbox,waiters,pattern,sources,timeout,maxbatch):
+    # Wait until at least one item matching the pattern (and sources) is
+    # available, then return all matching items (up to maxbatch items)
+    cpatt = compile_pattern(pattern)
+    actor.lock.acquire()
+    if not actor.active:
+        actor.lock.release()
+        return None
+    # Items already stored in mailbox are returned without waiting
+    items = mbox.take_all(cpatt,sources,maxbatch)
+    if len(items)>0:
+        actor.lock.release()
+        return items
+    waiter = _newWaiter(cpatt,sources)
+    waiters.append(waiter)
+    actor.lock.release()
+    first = _waitForWaiter(actor,waiters,waiter,timeout)
+    if first==None:
+        return None
+    items = [first]
+    if maxbatch!=None:
+        maxbatch = maxbatch-1
+        if maxbatch<=0:
+            return items
+    # Items received together with the first item were stored in mailbox
+    actor.lock.acquire()
+    if actor.active:
+        items.extend(mbox.take_all(cpatt,sources,maxbatch))
+    actor.lock.release()
+    return items
 
+def _wakeAllWaiters(actor):
+    # Must be called with actor.lock acquired
+    for waiters in (actor.waiters_vrmsg,actor.waiters_vrevnt,actor.waiters_agmsg):
+        for waiter in waiters:
+            waiter.enabled = False
+            waiter.signalpyev.set()
 
 #*******************************************
 # FUNCTION TO HANDLE VR MESSAGES WAITERS
@@ -401,10 +1297,9 @@ def _handleVRMsgsWaiters(acid,newvrmsgs):
     global ActorsTbl, ActorsTblLock
     # First lock the general lock (VRActorsLock), ensuring mutex
     # access to VR actors descriptors table (VRActors dictionary).
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
+    actor = _getActor(acid)
     if actor==None:
-        # Actor stopped, ends handle event thread
+        # Actor stopped, ends handling of actor
         return False
     # Then locks the specific lock of the VR actor (VRActor[acid].lock 
     # or actor.lock), which ensures mutex access to this particular VR 
@@ -413,44 +1308,20 @@ def _handleVRMsgsWaiters(acid,newvrmsgs):
     # Now the work with VR actor descriptor can be done. When this 
     # work is finished, then the VR actor descriptor lock is unlocked.
     if  not actor.active:
-        # Actor inactive (stopping), release locks and ends handle event thread
-        actor.lock.release()
-        return False
-    # If some VR message is being waited, check if there is a message in VR msgs.
-    # buffer retrieved from VR actor controller that _matchEvOrMsg the waiting pattern.
-    waiting = actor.waiter_vrmsg.enabled
-    patt = actor.waiter_vrmsg.pattern
-    actor.lock.release()
-    found = False
-    if waiting and len(newvrmsgs)>0:
-        for i,vrmsg in enumerate(newvrmsgs):
-            print_list_dbg('ac-vrmsg',vrmsg)
-            if _matchEvOrMsg(patt,vrmsg):
-                # VR msg. matched pattern, extract msg. from buffer and 
-                # indicates found something
-                found = True
-#               print_dbg('ac','found OK')
-                newvrmsgs.pop(i)
-#               print_dbg('ac','pop OK')
-                break
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
-    if actor==None:
-        # Actor stopped, ends handle event thread
-        return False
-    actor.lock.acquire()
-    if  not actor.active:
-        # Actor inactive (stopping), release locks and ends handle event thread
+        # Actor inactive (stopping), release locks and ends handling of actor
         actor.lock.release()
         return False
-    if waiting and found:
-        # VR msg. found, signalize waiting Python event and returns found msg.
-        actor.waiter_vrmsg.obj = vrmsg
-        actor.waiter_vrmsg.enabled = False
-        actor.waiter_vrmsg.signalpyev.set()
-#       print_dbg('ac','waiting and found OK')
-    # Add any other VR msg. retrieved from VR controller to actor's VR msgs. list
-    actor.vrmsgs.extend(newvrmsgs)
+    # Each VR msg. retrieved from VR actor controller is delivered to the 
+    # first waiter whose pattern matches it. VR msgs. not delivered to any
+    # waiter are added to actor's VR msgs. list
+    for vrmsg in newvrmsgs:
+        vrmsg = VRMsg(vrmsg)
+        print_list_dbg('ac-vrmsg',vrmsg)
+        actor.metrics.vrmsgsrcvd += 1
+        if _deliverToWaiters(actor.waiters_vrmsg,vrmsg,actor.metrics):
+            actor.vrmsgs.deliver_direct()
+        else:
+            actor.vrmsgs.append(vrmsg)
     actor.lock.release()
     return True
 
@@ -460,52 +1331,24 @@ def _handleVRMsgsWaiters(acid,newvrmsgs):
 
 def _handleVREventsWaiters(acid,newvrevnts):
     global ActorsTbl, ActorsTblLock
-    # Each time event handler thread sleeps, all locks are released
-    # So, after the sleep, the locks must be acquired again
-    #ActorsTblLock.acquire()
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
-    #ActorsTblLock.release()
-    if actor==None:
-        return False
-    actor.lock.acquire()
-    if  not actor.active:
-        # Actor stopped, release locks and ends handle event thread
-        actor.lock.release()
-        return False
-    # If some VR event is being waited, check if there is a event in VR event
-    # buffer retrieved from VR actor controller that _matchEvOrMsg the waiting pattern.
-    waiting = actor.waiter_vrevnt.enabled
-    patt = actor.waiter_vrevnt.pattern
-    actor.lock.release()
-    found = False
-    if waiting and len(newvrevnts)>0:
-        for i,vrevnt in enumerate(newvrevnts):
-            print_dbg('ac','info: <rcvd vr evnt ',vrevnt,'>')
-            if _matchEvOrMsg(patt,vrevnt):
-                # VR ev. matched pattern, extract ev. from buffer and indicates
-                # found something
-                found = True
-                newvrevnts.pop(i)
-                break
-    #ActorsTblLock.acquire()
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
-    #ActorsTblLock.release()
+    actor = _getActor(acid)
     if actor==None:
-        # Actor stopped, release locks and ends handle event thread
         return False
     actor.lock.acquire()
     if  not actor.active:
-        # Actor inactive (stopping), release locks and ends handle event thread
+        # Actor stopped, release locks and ends handling of actor
         actor.lock.release()
         return False
-    if waiting and found:
-        actor.waiter_vrevnt.obj = vrevnt
-        actor.waiter_vrevnt.enabled = False
-        actor.waiter_vrevnt.signalpyev.set()
-    # Add any other VR ev. retrieved from VR controller to actor's VR evnts. list
-    actor.vrevnts.extend(newvrevnts)
+    # Each VR event retrieved from VR actor controller is delivered to the 
+    # first waiter whose pattern matches it. VR events not delivered to any
+    # waiter are added to actor's VR events list
+    for vrevnt in newvrevnts:
+        print_dbg('ac','info: <rcvd vr evnt ',vrevnt,'>')
+        actor.metrics.vrevntsrcvd += 1
+        if _deliverToWaiters(actor.waiters_vrevnt,vrevnt,actor.metrics):
+            actor.vrevnts.deliver_direct()
+        else:
+            actor.vrevnts.append(vrevnt)
     actor.lock.release()
     return True
 
@@ -516,107 +1359,159 @@ def _handleVREventsWaiters(acid,newvrevnts):
 
 def _handleActorMsgsWaiters(acid):
     global ActorsTbl, ActorsTblLock
-    # Each time event handler thread sleeps, all locks are released
-    # So, after the sleep, the locks must be acquired again
-    #ActorsTblLock.acquire()
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
-    #ActorsTblLock.release()
+    actor = _getActor(acid)
     if actor==None:
-        # Actor stopped, ends handle event thread
+        # Actor stopped, ends handling of actor
         return False
     actor.lock.acquire()
     if  not actor.active:
-        # Actor stopped, release locks and ends handle event thread
+        # Actor stopped, release locks and ends handling of actor
         actor.lock.release()
         return False
-    # If some actor message is being waited, check if there is a actor message in
-    # the actor message buffer of the actor that _matchEvOrMsg the waiting pattern.
-    if actor.waiter_agmsg.enabled:
-        msgpatt = actor.waiter_agmsg.pattern
-        if actor.waiter_agmsg.sources==None:
-            # The waiting pattern does not specify any actor or actors
-            # as sources of the message, check the remaining elements
-            # of the pattern
-            for i,msg in enumerate(actor.acmsgs):
-                if _matchEvOrMsg(msgpatt,msg):
-                    # Ag. msg. matched the pattern, extract msg. from buffer and  
-                    # signalize waiting Python event, returning the msg.
-                    actor.waiter_agmsg.obj = msg
-                    actor.waiter_agmsg.enabled = False
-                    actor.acmsgs.pop(i)
-                    actor.waiter_agmsg.signalpyev.set()
-                    break
-        elif type(actor.waiter_agmsg.sources) is not list:
-            # The waiting pattern specify a single actor as the source of message
-            srcacid=actor.waiter_agmsg.sources
-            for i,msg in enumerate(actor.acmsgs):
-                if msg[1]!=srcacid:
-                    continue
-                if _matchEvOrMsg(msgpatt,msg):
-                    # Ag. msg. matched source actor. and pattern, extract msg. from  
-                    # buffer and signalize waiting Python event, returning the msg.
-                    actor.waiter_agmsg.obj = msg
-                    actor.waiter_agmsg.enabled = False
-                    actor.acmsgs.pop(i)
-                    actor.waiter_agmsg.signalpyev.set()
-                    break
-        else:
-            # The waiting pattern specify a list of actors as the sources of msg.
-            srcacids=actor.waiter_agmsg.sources
-            for i,msg in enumerate(actor.acmsgs):
-                if msg[1] not in srcacids:
-                    continue
-                if _matchEvOrMsg(msgpatt,msg):
-                    # Ag. msg. matched source actor. and pattern, extract msg. from  
-                    # buffer and signalize waiting Python event, returning the msg.
-                    actor.waiter_agmsg.obj = msg
-                    actor.waiter_agmsg.enabled = False
-                    actor.acmsgs.pop(i)
-                    actor.waiter_agmsg.signalpyev.set()
-                    break
+    # If some actor message is being waited, look in the actor message
+    # mailbox for the first message matching the sources and pattern of 
+    # each waiter. Delivered messages are extracted from the mailbox.
+    for waiter in actor.waiters_agmsg:
+        if not waiter.enabled:
+            continue
+        msg = actor.acmsgs.take_first(waiter.pattern,waiter.sources)
+        if msg!=None:
+            waiter.obj = msg
+            waiter.enabled = False
+            waiter.signalpyev.set()
     actor.lock.release()
     return True
 
 
 #*******************************************
-# THREAD WHICH HANDLES ALL EVENTS FOR THE 
-# ACTOR. THAT INCLUDES: VR EVENTS, VR MSGS 
-# AND OTHER'S ACTORS COMM MSGS
+# EVENT PUMP: POOL OF THREADS WHICH HANDLES 
+# ALL EVENTS OF ALL ACTORS. THAT INCLUDES: 
+# VR EVENTS, VR MSGS AND OTHER'S ACTORS 
+# COMM MSGS
 #*******************************************
 
-def _handleAllEventsThread(acid,acname,agctl):
-    global ActorsTbl, ActorsTblLock
-    #ActorsTblLock.acquire()
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
-    #ActorsTblLock.release()
-    if actor==None:
-        # Actor stopped, ends handle event thread
-        return
-
-    #*******************************************************
-    # MESSAGES/EVENTS PROCESSING LOOP
-
+class EventPump:
+    """__init__() class constructor"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.readyq = queue.Queue()
+        self.workers = []
+        self.pollthr = None
+
+EvPump = EventPump()
+
+def _pumpActor(actor):
+    # Retrieve last messages and events from VR actor controller
+    acid = actor.id
+    # Actors stopped or no more in the actors table are released without
+    # calling into their VR actor controller
+    if _getActor(acid) is not actor or not actor.active:
+        return False
+    agctl = actor.agctl
+    starttm = time.monotonic()
+    actor.lastpump = starttm
+    newvrmsgs = agctl.CommActs.LookForMsgs()
+    newvrevnts = agctl.ObsActs.LookForEvents()
+    # Handle VR messages waiters, VR events waiters and actor messages 
+    # waiters
+    handled = _handleVRMsgsWaiters(acid,newvrmsgs) and \
+                _handleVREventsWaiters(acid,newvrevnts) and \
+                _handleActorMsgsWaiters(acid)
+    actor.metrics.pumpruns += 1
+    actor.metrics.pumptime.observe(time.monotonic()-starttm)
+    return handled
+
+def _eventPumpWorkerThread():
     while True:
-        # Retrieve last messages and events from VR actor controller
-        newvrmsgs = agctl.CommActs.LookForMsgs()
-        newvrevnts = agctl.ObsActs.LookForEvents()
-        # Handle VR messages waiters
-        if not _handleVRMsgsWaiters(acid,newvrmsgs):
-            return
-        # Sleep a little, to let other threads run.
-        time.sleep(0.1)
-        # Handle VR events waiters 
-        if not _handleVREventsWaiters(acid,newvrevnts):
+        actor = EvPump.readyq.get()
+        if actor==None:
+            # Number of worker threads was reduced, ends this worker
             return
-        # Sleep a little, to let other threads run.
-        time.sleep(0.1)
-        # Handle actor messages waiters 
-        if not _handleActorMsgsWaiters(acid):
+        # Handle the actor until there is no more pending inbound data,
+        # the actor stays queued meanwhile, so no other worker can handle 
+        # it at the same time
+        while True:
+            with actor.pumplock:
+                if not actor.pumppending:
+                    actor.pumpqueued = False
+                    actor.pumpidle.set()
+                    break
+                actor.pumppending = False
+            try:
+                active = _pumpActor(actor)
+            except Exception as e:
+                print_dbg('ac','event pump failed for actor: ',actor.id,' error: ',e)
+                active = actor.active
+            if not active:
+                with actor.pumplock:
+                    actor.pumppending = False
+                    actor.pumpqueued = False
+                    actor.pumpidle.set()
+                break
+
+def _eventPumpPollThread():
+    # Periodically schedule actors whose VR actor controller cannot notify
+    # new inbound data, and also any actor idle for more than EvIdleTimeout
+    while True:
+        time.sleep(EvPollPeriod)
+        actors = ActorsTbl.values()
+        now = time.monotonic()
+        for actor in actors:
+            if not actor.active:
+                continue
+            if actor.inboundhnd==None or now-actor.lastpump>=EvIdleTimeout:
+                _signalInbound(actor)
+
+def _startEventPump():
+    with EvPump.lock:
+        if EvPump.pollthr!=None:
             return
-        # Sleep a little, to let other threads run.
-        time.sleep(0.1)
+        _resizeEventPump(EvPumpThreads)
+        EvPump.pollthr = threading.Thread(target=_eventPumpPollThread,
+                                name='stage event pump poll thread', daemon=True)
+        EvPump.pollthr.start()
+
+def _resizeEventPump(nthreads):
+    # Must be called with EvPump.lock acquired
+    EvPump.workers = [thr for thr in EvPump.workers if thr.is_alive()]
+    while len(EvPump.workers)<nthreads:
+        thr = threading.Thread(target=_eventPumpWorkerThread, 
+                    name='stage event pump thread '+str(len(EvPump.workers)), daemon=True)
+        EvPump.workers.append(thr)
+        thr.start()
+    while len(EvPump.workers)>nthreads:
+        EvPump.workers.pop()
+        EvPump.readyq.put(None)
+
+def set_event_pump_threads(nthreads):
+    """ Set the number of worker threads of the event pump. The event pump
+        handles VR messages, VR events and inter-actor communications of all 
+        actors running in this instance of VirtualStage, so the number of 
+        threads does not depend on the number of actors.
+        
+    Args:
+        nthreads:   int with the number of worker threads, must be >= 1.
+
+    Returns:     
+        On fail, returns False.     
+        On success, returns True.           
+    """
+    global EvPumpThreads
+    if type(nthreads) is not int or nthreads<1:
+        return False
+    with EvPump.lock:
+        EvPumpThreads = nthreads
+        if EvPump.pollthr!=None:
+            _resizeEventPump(nthreads)
+    return True
+
+def get_event_pump_threads():
+    """ Get the number of worker threads of the event pump. 
+        
+    Returns:     
+        An int with the number of worker threads.           
+    """
+    return EvPumpThreads
 
 
 #*******************************************
@@ -715,6 +1610,7 @@ def wait_vrmsg(acid,msgpatt,timeout):
                         then some of these strings must match corresponding field;
                         - Otherwise the pattern string must be a substring of 
                         the corresponding field.
+                    The pattern can also be a pattern compiled by compile_pattern().
                     
         timeout:    if different than None, defines the maximum time in seconds
                     to wait for the message.
@@ -726,44 +1622,53 @@ def wait_vrmsg(acid,msgpatt,timeout):
 
     global ActorsTbl, ActorsTblLock
     # Check if parameters are ok
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
+    actor = _getActor(acid)
     if actor==None:
         return None
     # Acquire lock
     actor.lock.acquire()
-    if actor.waiter_vrmsg.enabled or not actor.active:
-        # Already waiting for VR message (or actor is inactive)
+    if not actor.active:
         actor.lock.release()
         return None
-    # Configure VR message detection mechanism implemented by event handler 
-    # thread with VR message pattern
-    actor.waiter_vrmsg.pattern=msgpatt
-    actor.waiter_vrmsg.signalpyev.clear()
-    actor.waiter_vrmsg.enabled=True
+    # Register a new waiter in VR message detection mechanism implemented 
+    # by event pump, other scripts of the actor can be waiting for other
+    # VR messages at the same time
+    waiter = _newWaiter(msgpatt)
+    actor.waiters_vrmsg.append(waiter)
     actor.lock.release()
-    # Release locks and waits for event handler thread to find the VR message
-    found = actor.waiter_vrmsg.signalpyev.wait(timeout)
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
+    # Release lock and wait for event pump to find the VR message, if a
+    # timeout ocurred no VR message was found and None is returned
+    return _waitForWaiter(actor,actor.waiters_vrmsg,waiter,timeout)
+
+def wait_vrmsgs(acid,msgpatt,timeout,max_batch=None):
+    """ Wait for messages sent by VR simulator from other avatars/agents,
+        that match the msgpatt search pattern, returning all of them at once.
+        Blocks until at least one matching message is available (or until
+        timeout seconds, if timeout is different than None), then returns 
+        every matching message currently received. 
+        
+    Unlike wait_vrmsg(), matching messages already stored in the reception
+    queue are also returned. For a description of types and fields of VR
+    messages and of search patterns see the help of wait_vrmsg().
+        
+    Args:
+        acid:       str with unique global identifier of actor.
+        msgpatt:    the message search pattern (see wait_vrmsg()).
+        timeout:    if different than None, defines the maximum time in seconds
+                    to wait for the first message.
+        max_batch:  if different than None, defines the maximum number of 
+                    messages returned.
+
+    Returns:     
+        On fail, returns None.      
+        On success, returns a list of messages, in order of arrival.           
+    """
+    global ActorsTbl, ActorsTblLock
+    actor = _getActor(acid)
     if actor==None:
         return None
-    actor.lock.acquire()
-    if not actor.active:
-        actor.lock.release()
-        return None
-    if found:
-        # The VR Message found by detection mechanism, is stored in obj field
-        msg = actor.waiter_vrmsg.obj
-    else:
-        # Timeout ocurred, no VR message was found
-        msg = None
-    actor.waiter_vrmsg.signalpyev.clear()
-    actor.waiter_vrmsg.enabled=False
-    actor.waiter_vrmsg.obj = None
-    actor.lock.release()
-    # Return what was found
-    return msg
+    return _waitBatch(actor,actor.vrmsgs,actor.waiters_vrmsg,msgpatt,None,
+                        timeout,max_batch)
 
 def get_vrmsg(acid,msgpatt=None):
     """ Get the last message sent by VR simulator that match the msgpatt search 
@@ -788,22 +1693,14 @@ def get_vrmsg(acid,msgpatt=None):
     """
 
     global ActorsTbl, ActorsTblLock
-    #ActorsTblLock.acquire()
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
-    #ActorsTblLock.release()
+    actor = _getActor(acid)
     if actor==None:
         return None
     actor.lock.acquire()
     if  not actor.active:
         actor.lock.release()
         return None;
-    result = None
-    for i,msg in enumerate(actor.vrmsgs):
-        if _matchEvOrMsg(msgpatt,msg):
-            result = msg
-            actor.vrmsgs.pop(i)
-            break
+    result = actor.vrmsgs.take_first(msgpatt)
     actor.lock.release()
     return result
 
@@ -819,10 +1716,7 @@ def clear_vrmsgs(acid):
     """
 
     global ActorsTbl, ActorsTblLock
-    #ActorsTblLock.acquire()
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
-    #ActorsTblLock.release()
+    actor = _getActor(acid)
     if actor==None:
         return False
     actor.lock.acquire()
@@ -876,44 +1770,50 @@ def wait_vrevnt(acid,evntpatt,timeout):
     """
 
     global ActorsTbl, ActorsTblLock
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
-    if actor==None:
-        return None
-    actor.lock.acquire()
-    if actor.waiter_vrevnt.enabled or not actor.active:
-        # Already waiting for VR event (or actor is inactive)
-        actor.lock.release()
-        return None
-    # Configure VR message detection mechanism implemented by event handler 
-    # thread with VR message pattern
-    actor.waiter_vrevnt.pattern=evntpatt
-    actor.waiter_vrevnt.signalpyev.clear()
-    actor.waiter_vrevnt.enabled=True
-    actor.lock.release()
-    # Release lock and wait for event handler thread to find the VR event
-    found =  actor.waiter_vrevnt.signalpyev.wait(timeout)
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
+    actor = _getActor(acid)
     if actor==None:
         return None
     actor.lock.acquire()
     if not actor.active:
         actor.lock.release()
         return None
-    if found:
-        # VR event found by detection mechanism is stored in obj field
-        evnt = actor.waiter_vrevnt.obj
-    else:
-        # Timeout ocurred, no VR event was found
-        evnt = None
-    actor.waiter_vrevnt.signalpyev.clear()
-    actor.waiter_vrevnt.enabled=False
-    actor.waiter_vrevnt.obj = None
+    # Register a new waiter in VR event detection mechanism implemented 
+    # by event pump
+    waiter = _newWaiter(evntpatt)
+    actor.waiters_vrevnt.append(waiter)
     actor.lock.release()
-    # Return what was found
-    return evnt
+    # Release lock and wait for event pump to find the VR event
+    return _waitForWaiter(actor,actor.waiters_vrevnt,waiter,timeout)
+
+
+def wait_vrevnts(acid,evntpatt,timeout,max_batch=None):
+    """ Wait for events sent by VR simulator that match the evntpatt pattern,
+        returning all of them at once. Blocks until at least one matching
+        event is available (or until timeout seconds, if timeout is different
+        than None), then returns every matching event currently received. 
+        
+    Unlike wait_vrevnt(), matching events already stored in the reception
+    queue are also returned. For a description of types and fields of VR
+    events see the help of wait_vrevnt().
+        
+    Args:
+        acid:       str with unique global identifier of actor.
+        evntpatt:   the event pattern (see wait_vrevnt()).
+        timeout:    if different than None, defines the maximum time in seconds
+                    to wait for the first event.
+        max_batch:  if different than None, defines the maximum number of 
+                    events returned.
 
+    Returns:     
+        On fail, returns None.      
+        On success, returns a list of events, in order of arrival.           
+    """
+    global ActorsTbl, ActorsTblLock
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    return _waitBatch(actor,actor.vrevnts,actor.waiters_vrevnt,evntpatt,None,
+                        timeout,max_batch)
 
 def get_vrevnt(acid,evntpatt=None):
     """ Get the last event sent by VR simulator that match the evntpatt search 
@@ -937,20 +1837,14 @@ def get_vrevnt(acid,evntpatt=None):
         On success, returns the event as a list of strings.         
     """
     global ActorsTbl, ActorsTblLock
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
+    actor = _getActor(acid)
     if actor==None:
         return None
     actor.lock.acquire()
     if  not actor.active:
         actor.lock.release()
         return None;
-    result = None
-    for i,evnt in enumerate(actor.vrevnts):
-        if _matchEvOrMsg(evntpatt,evnt):
-            result = evnt
-            actor.vrevnts.pop(i)
-            break
+    result = actor.vrevnts.take_first(evntpatt)
     actor.lock.release()
     return result
 
@@ -966,8 +1860,7 @@ def clear_vrevnts(acid):
     """
 
     global ActorsTbl, ActorsTblLock
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
+    actor = _getActor(acid)
     if actor==None:
         return False
     actor.lock.acquire()
@@ -987,8 +1880,8 @@ def send_comm(acid,dstacids,comtype,content,slots):
         
     Communications are messages that can be exchanged between VirtualStage 
     actors but do not pass trough the VR simulator. These communications 
-    are formed by lists with the following format:
-        [comtype, acid, content, acname, slots]
+    are formed by immutable tuples (CommMsg objects) with the format:
+        (comtype, acid, content, acname, slots)
     where:
         comtype is a string, which defines the type of the communication;
         acid is a string with the unique identifier of source actor that 
@@ -996,13 +1889,15 @@ def send_comm(acid,dstacids,comtype,content,slots):
         content is the text of the communication
         acname is a string with the name of source actor that sent the 
             communications
-        slots is a list of additional fields, can be None of the empty
-            list []
+        slots is a tuple of additional fields, can be None of the empty
+            tuple () (a slots list given to send_comm() is converted to tuple)
 
     Args:
         acid:       str with unique global identifier of actor.
         dstacids:   list of strings with unique global identifiers of actor that
-                    will receive the communication.
+                    will receive the communication (actors running in other
+                    VirtualStage processes are reached through the comm 
+                    transport, see set_comm_transport()).
         comtype     str that defines the type of the communication;
         content     str with the text of the communication
         slots       list of strings with an additional list of slots
@@ -1013,28 +1908,42 @@ def send_comm(acid,dstacids,comtype,content,slots):
     """
 
     global ActorsTbl, ActorsTblLock
-    with ActorsTblLock:
-        if not acid in ActorsTbl:
-            return False
-        acname=ActorsTbl[acid].name
-        dstags = []
-        if type(dstacids) is not list:
-            dstag = ActorsTbl.get(dstacids) 
-            dstags.append(dstag)
-        else:
-            for dstacid in dstacids:
-                dstag = ActorsTbl.get(dstacid) 
-                dstags.append(dstag)
-    acmsg=[comtype,acid,content,acname,slots]
-    sent = False
-    for dstag in dstags:
+    actorstbl = ActorsTbl
+    if not acid in actorstbl:
+        return False
+    acname=actorstbl[acid].name
+    if type(dstacids) is not list:
+        dstacids = [dstacids]
+    acmsg=CommMsg(comtype,acid,content,acname,slots)
+    transport = CommTransport
+    nsent = 0
+    for dstacid in dstacids:
+        dstag = actorstbl.get(dstacid) 
         if dstag!=None:
-            dstag.lock.acquire()
-            if dstag.active:
-                dstag.acmsgs.append(acmsg)
-                sent = True
-            dstag.lock.release()
-    return sent
+            if _deliverComm(dstag,acmsg):
+                nsent += 1
+        elif transport!=None:
+            # Destination actor can be running in other VirtualStage process
+            if transport.send_comm(dstacid,acmsg):
+                nsent += 1
+    _countCommsSent(actorstbl[acid],nsent)
+    return nsent>0
+
+def _deliverComm(dstag,acmsg):
+    # Store comm in mailbox of destination actor and schedule it in the
+    # event pump, returns False if comm was not stored
+    dstag.lock.acquire()
+    stored = dstag.active and dstag.acmsgs.append(acmsg)!=None
+    if stored:
+        dstag.metrics.commsrcvd += 1
+        _signalInbound(dstag)
+    dstag.lock.release()
+    return stored
+
+def _countCommsSent(actor,nsent):
+    actor.lock.acquire()
+    actor.metrics.commssent += nsent
+    actor.lock.release()
 
 
 def wait_comm(acid,srcacids,commpatt,timeout):
@@ -1045,8 +1954,8 @@ def wait_comm(acid,srcacids,commpatt,timeout):
         
     Communications are messages that can be exchanged between VirtualStage 
     actors but do not pass trough the VR simulator. These communications 
-    are formed by lists with the following format:
-        [comtype, acid, content, acname, slots]
+    are formed by immutable tuples (CommMsg objects) with the format:
+        (comtype, acid, content, acname, slots)
     where:
         comtype is a string, which defines the type of the communication;
         acid is a string with the unique identifier of source actor that 
@@ -1054,8 +1963,8 @@ def wait_comm(acid,srcacids,commpatt,timeout):
         content is the text of the communication
         acname is a string with the name of source actor that sent the 
             communications
-        slots is a list of additional fields, can be None of the empty
-            list []
+        slots is a tuple of additional fields, can be None of the empty
+            tuple () (a slots list given to send_comm() is converted to tuple)
 
     Args:
         acid:       str with unique global identifier of actor.
@@ -1073,48 +1982,60 @@ def wait_comm(acid,srcacids,commpatt,timeout):
 
     Returns:    
         On fail, returns None.      
-        On success, returns the communication as a list of strings.         
+        On success, returns the communication as a CommMsg tuple.         
     """
     global ActorsTbl, ActorsTblLock
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
-    if actor==None:
-        return None
-    actor.lock.acquire()
-    if actor.waiter_agmsg.enabled or not actor.active:
-        # Already waiting for message from other actor (or is inactive)
-        actor.lock.release()
-        return None
-    # Configure actor message detection mechanism implemented by event handler 
-    # thread with actor message pattern
-    actor.waiter_agmsg.pattern=commpatt
-    actor.waiter_agmsg.sources=srcacids
-    actor.waiter_agmsg.signalpyev.clear()
-    actor.waiter_agmsg.enabled=True
-    actor.lock.release()
-    # Release lock and wait for event handler thread to find the actor message
-    found = actor.waiter_agmsg.signalpyev.wait(timeout)
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
+    actor = _getActor(acid)
     if actor==None:
         return None
     actor.lock.acquire()
     if not actor.active:
         actor.lock.release()
         return None
-    if found:
-        # Message is stored in obj field by detection mechanism
-        acmsg = actor.waiter_agmsg.obj
-    else:
-        # Timeout ocurred
-        acmsg = None
-    actor.waiter_agmsg.signalpyev.clear()
-    actor.waiter_agmsg.enabled=False
-    actor.waiter_agmsg.obj = None
+    # Register a new waiter in actor message detection mechanism implemented
+    # by event pump with sources and actor message pattern
+    waiter = _newWaiter(commpatt,srcacids)
+    actor.waiters_agmsg.append(waiter)
+    # Comms already received can match the pattern, so schedule actor in
+    # the event pump to check them
+    _signalInbound(actor)
     actor.lock.release()
-    # Return what was found
-    return acmsg
-
+    # Release lock and wait for event pump to find the actor message
+    return _waitForWaiter(actor,actor.waiters_agmsg,waiter,timeout)
+
+def wait_comms(acid,srcacids,commpatt,timeout,max_batch=None):
+    """ Wait for communications sent by other actors that match the commpatt 
+        search pattern, returning all of them at once. Blocks until at least
+        one matching communication is available (or until timeout seconds, 
+        if timeout is different than None), then returns every matching 
+        communication currently received. 
+        
+    Communications are messages that can be exchanged between VirtualStage 
+    actors but do not pass trough the VR simulator. See the help of
+    wait_comm() for a description of the format of communications.
+        
+    Args:
+        acid:       str with unique global identifier of actor.
+        srcacids:   list with unique global identifiers of actors that could have
+                    sent the communication, 
+                    if srcacids is None accept communications from any actors.
+        commpatt:   the communication search pattern (see wait_comm()).
+        timeout:    if different than None, defines the maximum time in seconds
+                    to wait for the first communication.
+        max_batch:  if different than None, defines the maximum number of 
+                    communications returned.
+
+    Returns:    
+        On fail, returns None.      
+        On success, returns a list of communications, in order of arrival.         
+    """
+    global ActorsTbl, ActorsTblLock
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    return _waitBatch(actor,actor.acmsgs,actor.waiters_agmsg,commpatt,srcacids,
+                        timeout,max_batch)
+
 def seek_comms(acid,srcacids,commpatt):
     """ Seek for the list of last communications received by this actor
         from some actor in srcacids list and that match the commpatt search 
@@ -1143,34 +2064,14 @@ def seek_comms(acid,srcacids,commpatt):
     """
 
     global ActorsTbl, ActorsTblLock
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
+    actor = _getActor(acid)
     if actor==None:
         return None
     actor.lock.acquire()
     if  not actor.active:
         actor.lock.release()
         return None;
-    results = []
-    if srcacids==None:
-        for i,msg in enumerate(actor.acmsgs):
-            if _matchEvOrMsg(commpatt,msg):
-                results.append(msg)
-                actor.acmsgs.pop(i)
-    elif type(srcacids) is not list:
-        for i,msg in enumerate(actor.acmsgs):
-            if msg[1]!=srcacids:
-                continue
-            if _matchEvOrMsg(commpatt,msg):
-                results.append(msg)
-                actor.acmsgs.pop(i)
-    else:
-        for i,msg in enumerate(actor.acmsgs):
-            if msg[1] not in srcacids:
-                continue
-            if _matchEvOrMsg(commpatt,msg):
-                results.append(msg)
-                actor.acmsgs.pop(i)
+    results = actor.acmsgs.take_all(commpatt,srcacids)
     actor.lock.release()
     return results
 
@@ -1187,8 +2088,7 @@ def clear_comms(acid):
         returns True.           
     """
     global ActorsTbl, ActorsTblLock
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
+    actor = _getActor(acid)
     if actor==None:
         return False
     actor.lock.acquire()
@@ -1199,17 +2099,828 @@ def clear_comms(acid):
 
 
 
+#*******************************************
+# CROSS-PROCESS COMMS TRANSPORT
+#
+# A comm transport delivers comms to actors running in other (sibling) 
+# VirtualStage processes, so send_comm() works unchanged for them. The 
+# transport is any object with the methods:
+#   send_comm(dstacid, acmsg): send comm to remote actor, returns False 
+#       if dstacid is not known by transport or comm could not be sent;
+#   register_actor(acid): called when a local actor starts;
+#   unregister_actor(acid): called when a local actor stops;
+#   close(): called when transport is replaced.
+# Comms received by the transport from other processes are delivered to 
+# local actors with deliver_remote_comm(). See module StageTransport.
+#*******************************************
+
+CommTransport = None
+
+def set_comm_transport(transport):
+    """ Set the transport used to send comms to actors running in other 
+        VirtualStage processes. Actors already running are registered in
+        the new transport. 
+        
+    Args:
+        transport:  the transport object (see StageTransport module), if 
+                    None remote comms are disabled.
+
+    Returns:     
+        On fail, returns False.     
+        On success, returns True.           
+    """
+    global CommTransport
+    oldtransport = CommTransport
+    CommTransport = transport
+    if oldtransport!=None and oldtransport is not transport:
+        oldtransport.close()
+    if transport!=None:
+        for acid in list(ActorsTbl.keys()):
+            transport.register_actor(acid)
+    return True
+
+def get_comm_transport():
+    """ Get the transport used to send comms to actors running in other 
+        VirtualStage processes, or None. """
+    return CommTransport
+
+def deliver_remote_comm(dstacid,acmsg):
+    """ Deliver a comm received from other VirtualStage process to a local 
+        actor. This function is called by comm transports.
+        
+    Args:
+        dstacid:    str with unique global identifier of destination actor.
+        acmsg:      the comm, a sequence with the fields 
+                    (comtype, acid, content, acname, slots).
+
+    Returns:     
+        On fail, returns False.     
+        On success, returns True.           
+    """
+    dstag = _getActor(dstacid)
+    if dstag==None:
+        return False
+    if type(acmsg) is not CommMsg:
+        acmsg = CommMsg(*acmsg)
+    return _deliverComm(dstag,acmsg)
+
+#*******************************************
+# PUBLISH/SUBSCRIBE CHANNELS FOR ACTOR COMMS
+#
+# Actors subscribe to named channels with a compiled filter pattern. A comm
+# published in a channel is delivered (as a normal comm) only to the 
+# subscribers whose filter matches it, each distinct filter is evaluated
+# once per publish. ChannelsTbl maps the name of channels to tuples of 
+# subscriptions and, like ActorsTbl, is never modified in place 
+# (copy-on-write), so publish does not need to acquire ChannelsTblLock.
+#*******************************************
+
+class Subscription:
+    """__init__() class constructor"""
+    def __init__(self, acid, pattern):
+        self.acid = acid
+        self.pattern = pattern
+
+ChannelsTblLock = threading.Lock()
+ChannelsTbl = {}
+
+def _unsubscribeAll(acid):
+    # Must be called with ChannelsTblLock acquired
+    global ChannelsTbl
+    newtbl = {}
+    for channel, subs in ChannelsTbl.items():
+        newsubs = tuple(sub for sub in subs if sub.acid!=acid)
+        if len(newsubs)>0:
+            newtbl[channel] = newsubs
+    ChannelsTbl = newtbl
+
+def subscribe_channel(acid,channel,commpatt=None):
+    """ Subscribe the actor to a channel: comms published in the channel 
+        that match the commpatt filter will be delivered to the actor, as
+        any other comm, and can be received with wait_comm(), seek_comms(),
+        etc. If the actor is already subscribed to the channel, its filter
+        is replaced.
+        
+    Args:
+        acid:       str with unique global identifier of actor.
+        channel:    str with the name of the channel.
+        commpatt:   search pattern of comms (see wait_comm()), the None
+                    value accepts all comms published in the channel.
+
+    Returns:     
+        On fail, returns False.     
+        On success, returns True.           
+    """
+    global ChannelsTbl, ChannelsTblLock
+    actor = _getActor(acid)
+    if actor==None or not actor.active or type(channel) is not str:
+        return False
+    sub = Subscription(acid,compile_pattern(commpatt))
+    with ChannelsTblLock:
+        newtbl = dict(ChannelsTbl)
+        subs = newtbl.get(channel,())
+        newtbl[channel] = tuple(s for s in subs if s.acid!=acid)+(sub,)
+        ChannelsTbl = newtbl
+    return True
+
+def unsubscribe_channel(acid,channel=None):
+    """ Cancel the subscription of the actor to a channel.
+        
+    Args:
+        acid:       str with unique global identifier of actor.
+        channel:    str with the name of the channel, if None cancels the 
+                    subscriptions of the actor to all channels.
+
+    Returns:     
+        On fail (actor was not subscribed), returns False.     
+        On success, returns True.           
+    """
+    global ChannelsTbl, ChannelsTblLock
+    with ChannelsTblLock:
+        if channel==None:
+            _unsubscribeAll(acid)
+            return True
+        subs = ChannelsTbl.get(channel,())
+        newsubs = tuple(sub for sub in subs if sub.acid!=acid)
+        if len(newsubs)==len(subs):
+            return False
+        newtbl = dict(ChannelsTbl)
+        if len(newsubs)>0:
+            newtbl[channel] = newsubs
+        else:
+            del newtbl[channel]
+        ChannelsTbl = newtbl
+    return True
+
+def get_channel_subscribers(channel):
+    """ Get the actors subscribed to a channel.
+        
+    Args:
+        channel:    str with the name of the channel.
+
+    Returns:     
+        Returns a list with the unique global identifiers of subscribers.
+    """
+    return [sub.acid for sub in ChannelsTbl.get(channel,())]
+
+def publish_comm(acid,channel,comtype,content,slots):
+    """ Publish a communication in a channel: the comm is delivered to all 
+        actors subscribed to the channel, whose filter match the comm, 
+        except the actor that published it. The comm has the same format of
+        comms sent by send_comm(), an immutable tuple (CommMsg object):
+            (comtype, acid, content, acname, slots)
+        where slots is also a tuple. The same CommMsg is delivered to all 
+        subscribers.
+        
+    Args:
+        acid:       str with unique global identifier of actor.
+        channel:    str with the name of the channel.
+        comtype     str that defines the type of the communication;
+        content     str with the text of the communication
+        slots       list or tuple of strings with additional slots, stored
+                    in the comm as a tuple
+
+    Returns:     
+        On fail, returns None.     
+        On success, returns a dict with delivery statistics:
+            'subscribers': number of subscribers of channel,
+            'matched': number of subscribers whose filter matched the comm,
+            'delivered': number of subscribers that received the comm,
+            'dropped': number of matching subscribers that did not receive 
+                the comm (actor stopped or comm dropped by its mailbox).
+    """
+    global ActorsTbl, ChannelsTbl
+    actorstbl = ActorsTbl
+    if not acid in actorstbl:
+        return None
+    acname = actorstbl[acid].name
+    subs = ChannelsTbl.get(channel,())
+    acmsg = CommMsg(comtype,acid,content,acname,slots)
+    stats = {'subscribers':len(subs), 'matched':0, 'delivered':0, 'dropped':0}
+    # Subscribers with the same filter share the same compiled pattern
+    matches = {}
+    for sub in subs:
+        if sub.acid==acid:
+            continue
+        matched = matches.get(id(sub.pattern))
+        if matched==None:
+            matched = sub.pattern.match(acmsg)
+            matches[id(sub.pattern)] = matched
+        if not matched:
+            continue
+        stats['matched'] += 1
+        dstag = actorstbl.get(sub.acid)
+        if dstag!=None and _deliverComm(dstag,acmsg):
+            stats['delivered'] += 1
+        else:
+            stats['dropped'] += 1
+    _countCommsSent(actorstbl[acid],stats['delivered'])
+    return stats
+
+#*******************************************
+# REQUEST/REPLY CALLS BETWEEN ACTORS
+#
+# An actor registers handlers for operations (ops) that can be called by 
+# other actors. Each call runs its handler on the call pool, bound to the
+# called actor, and returns a handle (a Future) to the caller. An actor can
+# have many outstanding calls, calls do not use the comms mailbox neither 
+# waiters, so they do not interfere with wait_comm().
+#
+# The call pool is not the script pool, so calls do not wait for threads 
+# held by long-running scripts. Calls made by a handler run inline, in the 
+# thread of the handler, so nested calls cannot use up the call pool.
+#*******************************************
+
+InCallHandler = contextvars.ContextVar('InCallHandler', default=False)
+
+def _runCallHandler(acid, handlername, handler, handlerargs, token):
+    inhandlerctx = InCallHandler.set(True)
+    try:
+        return _runPooledScript(acid,handlername,handler,handlerargs,token)
+    finally:
+        InCallHandler.reset(inhandlerctx)
+
+def register_call_handler(acid,op,handler):
+    """ Register the handler of an operation that can be called by other
+        actors with call_actor() or start_call(). The handler is a callable
+        Python function which will be called with the arguments:
+            acid: the unique global identifier of the called actor.
+            srcacid: the unique global identifier of the caller actor.
+            op: the operation.
+            args: the args of the operation given by the caller.
+        The value returned by the handler is the result of the call, if the
+        handler raises an exception, the call fails.
+        
+    Args:
+        acid:       str with unique global identifier of actor.
+        op:         str with the name of the operation.
+        handler:    callable Python function which implements the operation,
+                    if None the handler of the operation is removed.
+
+    Returns:     
+        On fail, returns False.     
+        On success, returns True.           
+    """
+    actor = _getActor(acid)
+    if actor==None or type(op) is not str:
+        return False
+    actor.lock.acquire()
+    if handler==None:
+        actor.callhandlers.pop(op,None)
+    else:
+        actor.callhandlers[op] = handler
+    actor.lock.release()
+    return True
+
+def _callDone(actor, call, future):
+    # Pass the result of the handler to the call handle, updating the
+    # latency of the call and the call statistics of caller actor
+    latency = time.monotonic()-call.starttm
+    call.latency = latency
+    actor.lock.acquire()
+    stats = actor.callstats
+    if future.cancelled() or future.exception()!=None:
+        stats.failed += 1
+    else:
+        stats.ok += 1
+    stats.totlatency += latency
+    stats.maxlatency = max(stats.maxlatency,latency)
+    stats.lastlatency = latency
+    actor.lock.release()
+    if future.cancelled():
+        call.set_exception(concurrent.futures.CancelledError())
+    elif future.exception()!=None:
+        call.set_exception(future.exception())
+    else:
+        call.set_result(future.result())
+
+def start_call(acid,dstacid,op,args=None):
+    """ Start a call of an operation of other actor, without waiting for 
+        the result. The handler of the operation runs on the call pool 
+        (see CallPoolSize), concurrently with other calls. If start_call() 
+        is called by a call handler, the handler of the new call runs 
+        inline and is done when start_call() returns.
+        
+    Args:
+        acid:       str with unique global identifier of actor.
+        dstacid:    str with unique global identifier of the called actor.
+        op:         str with the name of the operation.
+        args:       args of the operation, passed to the handler.
+
+    Returns:     
+        On fail, returns None.     
+        On success, returns a handle to the call, which is a Future object 
+        (see concurrent.futures module) with methods result(timeout), 
+        exception(timeout) and done(). The handle also has the attributes:
+            callid: unique identifier of the call,
+            latency: time in seconds from the start of the call until the
+                handler finished, set when the call is done.
+    """
+    actor = _getActor(acid)
+    dstag = _getActor(dstacid)
+    if actor==None or dstag==None or not actor.active or not dstag.active:
+        return None
+    dstag.lock.acquire()
+    handler = dstag.callhandlers.get(op)
+    dstag.lock.release()
+    if handler==None:
+        print_dbg('ac','start_call() failed - actor:'+dstacid+' has no handler for: '+str(op))
+        return None
+    actor.lock.acquire()
+    callid = acid+':'+str(actor.nextcallid)
+    actor.nextcallid += 1
+    actor.callstats.calls += 1
+    actor.lock.release()
+    call = concurrent.futures.Future()
+    call.set_running_or_notify_cancel()
+    call.callid = callid
+    call.latency = None
+    call.starttm = time.monotonic()
+    call.token = ScriptToken(dstacid,dstag.token)
+    handlername = dstag.name+' call '+callid
+    handlerargs = (dstacid,acid,op,args)
+    if InCallHandler.get():
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(_runCallHandler(dstacid,handlername,handler,
+                            handlerargs,call.token))
+        except Exception as exc:
+            future.set_exception(exc)
+    else:
+        future = _getCallExecutor().submit(_runCallHandler,dstacid,handlername,
+                            handler,handlerargs,call.token)
+    future.add_done_callback(lambda fut: dstag.token._removeChild(call.token))
+    future.add_done_callback(lambda fut: _callDone(actor,call,fut))
+    call.future = future
+    return call
+
+def call_actor(acid,dstacid,op,args=None,timeout=None):
+    """ Call an operation of other actor and wait for the result. 
+        
+    Args:
+        acid:       str with unique global identifier of actor.
+        dstacid:    str with unique global identifier of the called actor.
+        op:         str with the name of the operation.
+        args:       args of the operation, passed to the handler.
+        timeout:    maximum time in seconds to wait for the result, if None
+                    waits at most CallTimeout seconds. After the timeout the
+                    handler is cancelled (see cancel_script()).
+
+    Returns:     
+        On fail (no handler, handler failed or timeout), returns None.     
+        On success, returns the result returned by the handler.
+    """
+    call = start_call(acid,dstacid,op,args)
+    if call==None:
+        return None
+    if timeout==None:
+        timeout = CallTimeout
+    actor = _getActor(acid)
+    token = None
+    if actor!=None:
+        token = _currToken(actor)
+    if token!=None:
+        timeout = token.remaining(timeout)
+    try:
+        return call.result(timeout)
+    except concurrent.futures.TimeoutError:
+        call.future.cancel()
+        call.token.cancel()
+        if actor!=None:
+            actor.lock.acquire()
+            actor.callstats.timeouts += 1
+            actor.lock.release()
+        print_dbg('ac','call_actor() - timeout in call: '+call.callid)
+        return None
+    except Exception as exc:
+        print_dbg('ac','call_actor() - call: '+call.callid+' failed: '+repr(exc))
+        return None
+
+def get_call_stats(acid):
+    """ Get the statistics of calls made by the actor.
+        
+    Args:
+        acid:       str with unique global identifier of actor.
+
+    Returns:     
+        On fail, returns None.     
+        On success, returns a dict with keys:
+            'calls': number of calls started,
+            'ok': number of calls that returned a result,
+            'failed': number of calls whose handler failed or was cancelled,
+            'timeouts': number of calls whose caller stopped waiting,
+            'pending': number of calls not yet done,
+            'avg_latency': average latency of done calls in seconds,
+            'max_latency': max latency of done calls in seconds,
+            'last_latency': latency of last done call in seconds.
+    """
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    actor.lock.acquire()
+    stats = actor.callstats
+    done = stats.ok+stats.failed
+    result = { 'calls':stats.calls, 'ok':stats.ok, 'failed':stats.failed, 
+               'timeouts':stats.timeouts, 'pending':stats.calls-done,
+               'avg_latency':stats.totlatency/done if done>0 else None,
+               'max_latency':stats.maxlatency if done>0 else None,
+               'last_latency':stats.lastlatency }
+    actor.lock.release()
+    return result
+
+#*******************************************
+# MAILBOXES LIMITS AND STATISTICS FUNCTIONS
+#*******************************************
+
+def set_mailbox_limits(acid, capacity, policy='drop-oldest', ttl=None, mailbox=None):
+    """ Set the limits of the mailboxes (reception queues) of the actor.
+        
+    Each actor has 3 mailboxes: 'vrmsgs' stores VR messages, 'vrevnts'
+    stores VR events and 'acmsgs' stores inter-actor communications. 
+    Items are stored in the mailbox when they are not consumed by some
+    waiting function (like wait_vrmsg()) as soon as they are received.
+        
+    Args:
+        acid:       str with unique global identifier of actor.
+        capacity:   max number of items stored in the mailbox, None means
+                    unbounded mailbox.
+        policy:     policy applied to choose which item is dropped when 
+                    the mailbox is full:
+                        - 'drop-oldest': the oldest item is dropped;
+                        - 'drop-newest': the new item is dropped;
+                        - 'coalesce': only the last item of same type
+                        and from same sender is kept, if mailbox is still
+                        full then the oldest item is dropped.
+        ttl:        max time in seconds an item stays in the mailbox, 
+                    None means that items do not expire.
+        mailbox:    name of mailbox: 'vrmsgs', 'vrevnts' or 'acmsgs',
+                    if None set the limits of all mailboxes of actor.
+
+    Returns:     
+        On fail, returns False.     
+        On success, returns True.           
+    """
+    global ActorsTbl, ActorsTblLock
+    if policy not in MailboxPolicies:
+        return False
+    if capacity!=None and (type(capacity) is not int or capacity<0):
+        return False
+    actor = _getActor(acid)
+    if actor==None:
+        return False
+    mboxes = _actorMailboxes(actor)
+    if mailbox!=None:
+        if mailbox not in mboxes:
+            return False
+        mboxes = {mailbox:mboxes[mailbox]}
+    actor.lock.acquire()
+    if not actor.active:
+        actor.lock.release()
+        return False
+    for mbox in mboxes.values():
+        mbox.set_limits(capacity,policy,ttl)
+    actor.lock.release()
+    return True
+
+def set_default_mailbox_limits(capacity, policy='drop-oldest', ttl=None):
+    """ Set the default limits of the mailboxes of actors started after
+        this call. See the help of set_mailbox_limits() for details.
+        
+    Args:
+        capacity:   max number of items stored in a mailbox, None means
+                    unbounded mailboxes.
+        policy:     'drop-oldest', 'drop-newest' or 'coalesce'.
+        ttl:        max time in seconds an item stays in a mailbox, None
+                    means that items do not expire.
+
+    Returns:     
+        On fail, returns False.     
+        On success, returns True.           
+    """
+    global MailboxCapacity, MailboxPolicy, MailboxTTL
+    if policy not in MailboxPolicies:
+        return False
+    if capacity!=None and (type(capacity) is not int or capacity<0):
+        return False
+    MailboxCapacity = capacity
+    MailboxPolicy = policy
+    MailboxTTL = ttl
+    return True
+
+def get_mailbox_stats(acid):
+    """ Get the statistics of the mailboxes (reception queues) of the actor.
+        
+    Args:
+        acid:   str with unique global identifier of actor.
+
+    Returns:     
+        On fail, returns None.      
+        On success, returns a dict with keys 'vrmsgs', 'vrevnts' and 
+        'acmsgs', each one with a dict of statistics of the mailbox:
+            'size': number of items currently stored in mailbox;
+            'capacity', 'policy', 'ttl': current limits of mailbox;
+            'dropped': number of items dropped because mailbox was full;
+            'expired': number of items dropped because ttl expired;
+            'delivered': number of items delivered to waiting functions
+                or retrieved by get/seek functions.
+    """
+    global ActorsTbl, ActorsTblLock
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    actor.lock.acquire()
+    stats = {}
+    for name,mbox in _actorMailboxes(actor).items():
+        mbox.expire()
+        stats[name] = mbox.stats()
+    actor.lock.release()
+    return stats
+
+def _actorMailboxes(actor):
+    return {'vrmsgs':actor.vrmsgs, 'vrevnts':actor.vrevnts, 'acmsgs':actor.acmsgs}
+
+
+#*******************************************
+# ACTOR AND STAGE METRICS FUNCTIONS
+#*******************************************
+
+def _actorMetrics(actor):
+    # Must be called with actor.lock acquired
+    metrics = actor.metrics
+    result = {}
+    for name,mbox in _actorMailboxes(actor).items():
+        mbox.expire()
+        result[name] = mbox.metrics()
+    result['waits'] = {'count':metrics.waits, 'timeouts':metrics.waittimeouts,
+                       'waiting':len(actor.waiters_vrmsg)+len(actor.waiters_vrevnt)+
+                                 len(actor.waiters_agmsg),
+                       'wait_time':metrics.waittime.snapshot(),
+                       'waiters_scanned':metrics.waiterscan.snapshot()}
+    result['pump'] = {'runs':metrics.pumpruns, 'time':metrics.pumptime.snapshot()}
+    result['received'] = {'vrmsgs':metrics.vrmsgsrcvd, 'vrevnts':metrics.vrevntsrcvd,
+                          'acmsgs':metrics.commsrcvd}
+    result['comms_sent'] = metrics.commssent
+    result['scripts'] = len(actor.scripts)
+    return result
+
+def get_actor_metrics(acid):
+    """ Get the latency and throughput metrics of the actor. 
+        
+    Args:
+        acid:   str with unique global identifier of actor.
+
+    Returns:     
+        On fail, returns None.     
+        On success, returns a dict with keys:
+            'vrmsgs', 'vrevnts', 'acmsgs': metrics of each mailbox, a dict
+                with current size and max size of mailbox, number of items 
+                dropped, expired and delivered, the histogram of latency 
+                from arrival of items to its delivery to scripts (in 
+                seconds) and the histogram of items scanned per search,
+            'waits': number of waits finished, number of timeouts, number 
+                of waits in progress, histogram of time waited by scripts 
+                and histogram of waiters scanned per item received,
+            'pump': number of runs of event pump for the actor and histogram
+                of their duration,
+            'received': number of VR msgs, VR events and comms received,
+            'comms_sent': number of comms sent (or published) and delivered,
+            'scripts': number of secondary scripts not finished.
+        Histograms are dicts with keys 'count', 'avg', 'max', 'p50', 'p95'
+        (p50 and p95 are upper bounds of buckets) and 'buckets' (a list of 
+        [upper bound, count] pairs).
+    """
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    actor.lock.acquire()
+    result = _actorMetrics(actor)
+    actor.lock.release()
+    return result
+
+def get_stage_metrics():
+    """ Get the metrics of this instance of VirtualStage, aggregating the
+        metrics of all actors. 
+
+    Returns:     
+        Returns a dict with keys:
+            'actors': number of actors running,
+            'pump': number of threads of event pump and number of actors 
+                waiting for the event pump,
+            'script_pool': max number of scripts running at same time,
+            'channels': number of comm channels,
+            'received', 'dropped', 'delivered', 'comms_sent': totals of 
+                all actors,
+            'latency': histogram of arrival to delivery latency, for all 
+                mailboxes of all actors,
+            'wait_time': histogram of time waited by scripts of all actors.
+    """
+    actorstbl = ActorsTbl
+    received = {'vrmsgs':0, 'vrevnts':0, 'acmsgs':0}
+    dropped = 0
+    delivered = 0
+    commssent = 0
+    latency = Histogram(LatencyBuckets)
+    waittime = Histogram(LatencyBuckets)
+    for actor in actorstbl.values():
+        actor.lock.acquire()
+        metrics = actor.metrics
+        received['vrmsgs'] += metrics.vrmsgsrcvd
+        received['vrevnts'] += metrics.vrevntsrcvd
+        received['acmsgs'] += metrics.commsrcvd
+        commssent += metrics.commssent
+        waittime.merge(metrics.waittime)
+        for mbox in _actorMailboxes(actor).values():
+            dropped += mbox.dropped
+            delivered += mbox.delivered
+            latency.merge(mbox.latency)
+        actor.lock.release()
+    return {'time':time.time(), 'actors':len(actorstbl),
+            'pump':{'threads':get_event_pump_threads(), 
+                    'ready_actors':EvPump.readyq.qsize()},
+            'script_pool':ScriptPoolSize, 'channels':len(ChannelsTbl),
+            'received':received, 'dropped':dropped, 'delivered':delivered,
+            'comms_sent':commssent, 'latency':latency.snapshot(),
+            'wait_time':waittime.snapshot()}
+
+class MetricsDump:
+    """__init__() class constructor"""
+    def __init__(self, path, period, peractor):
+        self.path = path
+        self.period = period
+        self.peractor = peractor
+        self.stopev = threading.Event()
+        self.thread = None
+
+MetricsDumper = None
+
+def _metricsDumpThread(dump):
+    while not dump.stopev.wait(dump.period):
+        record = {'stage':get_stage_metrics()}
+        record['time'] = record['stage']['time']
+        if dump.peractor:
+            record['actors'] = {}
+            for acid, actor in ActorsTbl.items():
+                actor.lock.acquire()
+                record['actors'][actor.name] = _actorMetrics(actor)
+                actor.lock.release()
+        try:
+            with open(dump.path,'a',encoding='utf-8') as dumpfile:
+                dumpfile.write(json.dumps(record)+'\n')
+        except OSError as exc:
+            print_dbg('ac','metrics dump failed - '+repr(exc))
+
+def start_metrics_dump(path, period=10.0, peractor=True):
+    """ Start to dump periodically the metrics of the stage (and of each 
+        actor) to a JSON lines file, each line has the JSON of a dict with 
+        keys 'time', 'stage' (see get_stage_metrics()) and 'actors' (a dict
+        with the metrics of each actor, see get_actor_metrics(), by name).
+        
+    Args:
+        path:       path of the JSON lines file, lines are appended.
+        period:     period of dump in seconds.
+        peractor:   if False only stage metrics are dumped.
+
+    Returns:     
+        On fail, returns False.     
+        On success, returns True.           
+    """
+    global MetricsDumper
+    if period<=0:
+        return False
+    stop_metrics_dump()
+    dump = MetricsDump(path,period,peractor)
+    dump.thread = threading.Thread(target=_metricsDumpThread, args=(dump,),
+                            name='metrics dump thread', daemon=True)
+    MetricsDumper = dump
+    dump.thread.start()
+    return True
+
+def stop_metrics_dump():
+    """ Stop the periodic dump of metrics.
+
+    Returns:     
+        Returns True.           
+    """
+    global MetricsDumper
+    dump = MetricsDumper
+    MetricsDumper = None
+    if dump!=None:
+        dump.stopev.set()
+        if dump.thread is not threading.current_thread():
+            dump.thread.join()
+    return True
+
 #*******************************************
 # START/WAIT ACTOR SCRIPTS FUNCTIONS
 #*******************************************
 
-def start_script(acid,script,scriptargs):
-    """ Start a new actor script running on a new Python thread. 
+class ScriptPool:
+    """__init__() class constructor"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        # Number of scripts submitted to the pool and not yet finished
+        self.busy = 0
+
+ScrPool = ScriptPool()
+
+def _getScriptExecutor():
+    with ScrPool.lock:
+        if ScrPool.executor==None:
+            ScrPool.executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=ScriptPoolSize, thread_name_prefix='stage script thread')
+        return ScrPool.executor
+
+# Pool of threads of call handlers, see start_call()
+CallPool = ScriptPool()
+
+def _getCallExecutor():
+    with CallPool.lock:
+        if CallPool.executor==None:
+            CallPool.executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=CallPoolSize, thread_name_prefix='stage call thread')
+        return CallPool.executor
+
+def _runPooledScript(acid, scriptname, script, scriptargs, token):
+    # Pool threads are reused, so the name of the thread is changed while
+    # it runs the script, helping debugging
+    thr = threading.current_thread()
+    thrname = thr.name
+    thr.name = scriptname
+    try:
+        return _runActorScript(acid,script,scriptargs,token)
+    finally:
+        thr.name = thrname
+
+def _runScriptThread(acid, scriptname, script, scriptargs, token):
+    # Run the script in a dedicated thread, out of the script pool, the 
+    # handle of the script is a Future like the handles of pooled scripts
+    future = concurrent.futures.Future()
+    def runScript():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(_runActorScript(acid,script,scriptargs,token))
+        except BaseException as exc:
+            future.set_exception(exc)
+    threading.Thread(target=runScript,name=scriptname).start()
+    return future
+
+def _pooledScriptDone(future):
+    with ScrPool.lock:
+        ScrPool.busy -= 1
+
+def _scriptDone(actor, scriptid, future):
+    # Completed scripts are pruned from actor's scripts table
+    actor.lock.acquire()
+    actor.scripts.pop(scriptid,None)
+    actor.lock.release()
+    actor.token._removeChild(future.token)
+    if not future.cancelled() and future.exception()!=None:
+        print('Exception in script',scriptid,'of actor',actor.name+':')
+        exc = future.exception()
+        traceback.print_exception(type(exc),exc,exc.__traceback__)
+
+def set_script_pool_size(nthreads):
+    """ Set the max number of secondary scripts (started by start_script())
+        running at the same time in the script pool of this instance of 
+        VirtualStage. Scripts started when all threads of the pool are busy
+        run in dedicated threads, out of the pool.
+        
+    Args:
+        nthreads:   int with the max number of scripts running at the same
+                    time, must be >= 1.
+
+    Returns:     
+        On fail, returns False.     
+        On success, returns True.           
+    """
+    global ScriptPoolSize
+    if type(nthreads) is not int or nthreads<1:
+        return False
+    with ScrPool.lock:
+        ScriptPoolSize = nthreads
+        if ScrPool.executor!=None:
+            # Scripts already started continue running in the old pool
+            ScrPool.executor.shutdown(wait=False)
+            ScrPool.executor = None
+    return True
+
+def submit_script(acid,script,scriptargs,timeout=None):
+    """ Start a new actor script running on the script pool of the stage. 
+        The pool runs at most ScriptPoolSize scripts at the same time (see
+        set_script_pool_size()), when all threads of the pool are busy with
+        other scripts, the new script runs in a dedicated thread instead of
+        waiting in queue for a free thread of the pool.
         
     Args:
         acid: str with unique global identifier of actor.
         script: callable Python function which implements the script.
         scriptargs: tuple with additional args to be passed to script function.
+        timeout: if different than None, defines the deadline of the script,
+                 in seconds. After the deadline all waits of the script 
+                 return immediately, as if a timeout occurred.
         
         The script argument is a callable Python which will be called with 
         the following arguments:
@@ -1219,34 +2930,173 @@ def start_script(acid,script,scriptargs):
 
     Returns:    
         On fail, returns None.      
-        On success, starts the script as a new thread and returns the
-        identifier of the script.           
+        On success, returns a handle to the script, which is a Future object
+        (see concurrent.futures module) with methods result(), exception(), 
+        cancel(), done() and running(). The identifier of the script is 
+        stored in the scriptid attribute of the handle and its cancellation
+        token in the token attribute.           
     """
 
     global ActorsTbl, ActorsTblLock
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
+    actor = _getActor(acid)
     if actor==None:
-        return -1
+        return None
+    executor = _getScriptExecutor()
     actor.lock.acquire()
     if not actor.active:
         actor.lock.release()
-        return -1
-    scriptid = len(actor.secthrds)
-    acname = get_actor_name(acid)
-    secthr = threading.Thread(target=script,
-                          name=acname+' sec script thread ' + str(scriptid),
-                          args=(acid,acname,scriptargs))
-    actor.secthrds.append(secthr)
+        return None
+    scriptid = actor.nextscriptid
+    actor.nextscriptid += 1
+    scriptname = actor.name+' sec script ' + str(scriptid)
+    token = ScriptToken(acid,actor.token,timeout)
+    with ScrPool.lock:
+        pooled = ScrPool.busy<ScriptPoolSize
+        if pooled:
+            ScrPool.busy += 1
+    if pooled:
+        future = executor.submit(_runPooledScript,acid,scriptname,script,
+                            (acid,actor.name,scriptargs),token)
+        future.add_done_callback(_pooledScriptDone)
+    else:
+        print_dbg('ac','script pool full (',ScriptPoolSize,' scripts), ',
+                  scriptname,' runs in a dedicated thread')
+        future = _runScriptThread(acid,scriptname,script,
+                            (acid,actor.name,scriptargs),token)
+    future.scriptid = scriptid
+    future.token = token
+    actor.scripts[scriptid] = future
     actor.lock.release()
-    secthr.start()
-    return scriptid
+    future.add_done_callback(lambda fut: _scriptDone(actor,scriptid,fut))
+    return future
 
+def start_script(acid,script,scriptargs,timeout=None):
+    """ Start a new actor script running on the script pool of the stage. 
+        Scripts started when the pool is full run in dedicated threads, see
+        submit_script().
+        
+    Args:
+        acid: str with unique global identifier of actor.
+        script: callable Python function which implements the script.
+        scriptargs: tuple with additional args to be passed to script function.
+        timeout: if different than None, defines the deadline of the script,
+                 in seconds. After the deadline all waits of the script 
+                 return immediately, as if a timeout occurred.
+        
+        The script argument is a callable Python which will be called with 
+        the following arguments:
+            acid: a string with the unique global identifier of new actor.
+            acname: the name of new actor.
+            scriptargs: additional arguments. 
+
+    Returns:    
+        On fail, returns -1.      
+        On success, starts the script and returns the identifier of the 
+        script.           
+    """
+    future = submit_script(acid,script,scriptargs,timeout)
+    if future==None:
+        return -1
+    return future.scriptid
+
+def cancel_script(acid,scriptid):
+    """ Cancel the script: if it is still waiting in the queue of the script
+        pool it will not run, otherwise its cancellation token is cancelled,
+        so all waits of the script (wait_vrmsg(), wait_comm(), pause_for(), 
+        etc.) return immediately. Scripts must check script_cancelled() in 
+        their loops and finish when it returns True. 
+        
+    Args:
+        acid: str with unique global identifier of actor.
+        scriptid: identifier of the script.
 
+    Returns:     
+        On fail, returns False.     
+        On success, returns True.           
+    """
+    future = get_script_handle(acid,scriptid)
+    if future==None:
+        return False
+    future.cancel()
+    future.token.cancel()
+    return True
+
+def get_script_token(acid):
+    """ Get the cancellation token of the current script, if it is a script
+        of the actor. 
+        
+    Args:
+        acid: str with unique global identifier of actor.
+
+    Returns:     
+        On fail, returns None.     
+        On success, returns the ScriptToken of the current script.           
+    """
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    return _currToken(actor)
+
+def script_cancelled(acid):
+    """ Check if the current script of the actor was cancelled or reached its
+        deadline, or if the actor was stopped. 
+        
+    Args:
+        acid: str with unique global identifier of actor.
+
+    Returns:     
+        Returns True if the script must finish, otherwise returns False.           
+    """
+    actor = _getActor(acid)
+    if actor==None or not actor.active:
+        return True
+    token = _currToken(actor)
+    return token!=None and token.cancelled()
+
+def sleep_script(acid,seconds):
+    """ Sleep the current script of the actor for some seconds, the sleep
+        ends early if the script is cancelled or reaches its deadline. 
+        
+    Args:
+        acid: str with unique global identifier of actor.
+        seconds: number of seconds to sleep.
+
+    Returns:     
+        On fail (script cancelled), returns False.     
+        On success, returns True.           
+    """
+    actor = _getActor(acid)
+    if actor==None:
+        return False
+    token = _currToken(actor)
+    if token==None:
+        time.sleep(seconds)
+        return True
+    return token.sleep(seconds)
+
+def get_script_handle(acid,scriptid):
+    """ Get the handle of a script that is running or waiting to run. 
+        Scripts that already finished are pruned, so no handle is returned
+        for them (the handle returned by submit_script() is still valid).
+        
+    Args:
+        acid: str with unique global identifier of actor.
+        scriptid: identifier of the script.
+
+    Returns:     
+        On fail, returns None.     
+        On success, returns the handle of the script (a Future object).           
+    """
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    actor.lock.acquire()
+    future = actor.scripts.get(scriptid)
+    actor.lock.release()
+    return future
 
 def wait_script_finish(acid,scriptid,timeout=None):
-    """ Wait the script to finish, uses join() to wait for the corresponding
-        thread to terminates. 
+    """ Wait the script to finish. 
         
     Args:
         acid: str with unique global identifier of actor.
@@ -1260,24 +3110,151 @@ def wait_script_finish(acid,scriptid,timeout=None):
     """
 
     global ActorsTbl, ActorsTblLock
-    with ActorsTblLock:
-        actor = ActorsTbl.get(acid)
+    actor = _getActor(acid)
     if actor==None:
         return False
     actor.lock.acquire()
     if not actor.active:
         actor.lock.release()
         return False
-    if scriptid<0 or scriptid>=len(actor.secthrds):
+    if type(scriptid) is not int or scriptid<0 or scriptid>=actor.nextscriptid:
         actor.lock.release()
         return False
-    scriptthr = actor.secthrds[scriptid]
+    future = actor.scripts.get(scriptid)
     actor.lock.release()
-    scriptthr.join(timeout)
-    if (scriptthr.is_alive()):
-        return False
-    return True
+    if future==None:
+        # Script already finished and was pruned
+        return True
+    concurrent.futures.wait([future],timeout)
+    return future.done()
+
+def get_running_scripts(acid):
+    """ Get the identifiers of scripts of the actor that are running or
+        waiting to run. 
+        
+    Args:
+        acid: str with unique global identifier of actor.
+
+    Returns:     
+        On fail, returns None.     
+        On success, returns a list with the identifiers of scripts.           
+    """
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    actor.lock.acquire()
+    scriptids = list(actor.scripts.keys())
+    actor.lock.release()
+    return scriptids
     
+#*******************************************
+# ASYNCIO FACADE
+#
+# Coroutines that let many actors be driven from a single asyncio event 
+# loop. Waits for VR msgs, VR events and comms are asyncio futures fed
+# directly by the event pump, so they do not use any thread while waiting. 
+# Blocking actions are offloaded to a bounded thread pool.
+#*******************************************
+
+AsyncPool = ScriptPool()
+
+def _getAsyncExecutor():
+    with AsyncPool.lock:
+        if AsyncPool.executor==None:
+            AsyncPool.executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=AsyncPoolSize, thread_name_prefix='stage async action thread')
+        return AsyncPool.executor
+
+class _AsyncSignal:
+    # Replaces the threading.Event of a waiter: when set by the event pump 
+    # (or by a cancellation token) resolves an asyncio future in its loop
+    def __init__(self, loop):
+        self.loop = loop
+        self.future = loop.create_future()
+
+    def set(self):
+        try:
+            self.loop.call_soon_threadsafe(self._setFuture)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    def is_set(self):
+        return self.future.done()
+
+    def _setFuture(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+async def _asyncWait(actor,waiters,pattern,sources,timeout):
+    actor.lock.acquire()
+    if not actor.active:
+        actor.lock.release()
+        return None
+    waiter = _newWaiter(pattern,sources,_AsyncSignal(asyncio.get_running_loop()))
+    waiters.append(waiter)
+    if waiters is actor.waiters_agmsg:
+        # Comms already received can match the pattern
+        _signalInbound(actor)
+    actor.lock.release()
+    token = _currToken(actor)
+    if token!=None:
+        timeout = token.remaining(timeout)
+        token._addSignal(waiter.signalpyev)
+    try:
+        await asyncio.wait_for(asyncio.shield(waiter.signalpyev.future),timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        if token!=None:
+            token._removeSignal(waiter.signalpyev)
+        obj = _releaseWaiter(actor,waiters,waiter)
+    return obj
+
+async def async_action(acid,action,*args):
+    """ Run a blocking action (a function of some actions module, like 
+        MoveActions.walk_to()) in the bounded thread pool of the asyncio 
+        facade, awaiting for its result. 
+        
+    Args:
+        acid: str with unique global identifier of actor.
+        action: callable Python function which implements the action.
+        args: args to be passed to action function.
+
+    Returns:     
+        On fail, returns None.     
+        On success, returns the result of the action.           
+    """
+    if _getActor(acid)==None:
+        return None
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_getAsyncExecutor(),ctx.run,action,*args)
+
+async def async_wait_vrmsg(acid,msgpatt,timeout):
+    """ Coroutine version of wait_vrmsg(), see wait_vrmsg() for args and 
+        results. """
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    return await _asyncWait(actor,actor.waiters_vrmsg,msgpatt,None,timeout)
+
+async def async_wait_vrevnt(acid,evntpatt,timeout):
+    """ Coroutine version of wait_vrevnt(), see wait_vrevnt() for args and 
+        results. """
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    return await _asyncWait(actor,actor.waiters_vrevnt,evntpatt,None,timeout)
+
+async def async_wait_comm(acid,srcacids,commpatt,timeout):
+    """ Coroutine version of wait_comm(), see wait_comm() for args and 
+        results. """
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    return await _asyncWait(actor,actor.waiters_agmsg,commpatt,srcacids,timeout)
+
 #*******************************************
 # ACTOR AND VIRTUAL STAGE INFORMATION FUNCTIONS
 #*******************************************
@@ -1310,10 +3287,9 @@ def get_actor_id(acname):
     """
 
     global ActorsTbl, ActorsTblLock
-    with ActorsTblLock:
-        for acid,actor in ActorsTbl.items():
-            if actor.active and actor.name==acname:
-                return acid
+    for acid,actor in ActorsTbl.items():
+        if actor.active and actor.name==acname:
+            return acid
     return None
 
 
@@ -1326,18 +3302,10 @@ def curr_actor_id():
         On success, returns a string with the id of the actor.          
     """
 
-    global ActorsTbl, ActorsTblLock
-    thrid = threading.get_ident()
-    with ActorsTblLock:
-        for actor in ActorsTbl:
-            if actor.mainthr.ident==thrid or actor.evthr.ident==thrid:
-                acid = actor.acid
-                return acid
-            for scriptthr in actor.secthrds:
-                if scriptthr.ident==thrid:
-                    acid = actor.acid
-                    return acid
-    return None
+    acid = CurrActorId.get()
+    if acid==None or _getActor(acid)==None:
+        return None
+    return acid
     
 def get_agctl(acid):
     """ Get the C# module that controls the VR agent/avatar.        
@@ -1351,14 +3319,10 @@ def get_agctl(acid):
     """
 
     global ActorsTbl, ActorsTblLock
-    #ActorsTblLock.acquire()
-    with ActorsTblLock:
-        if acid in ActorsTbl.keys():
-            agctl = ActorsTbl[acid].agctl
-        else:
-            agctl=None
-    #ActorsTblLock.release()
-    return agctl
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    return actor.agctl
     
 def get_actor_name(acid):
     """ Get the name of the actor with acid identifier, names of actors are formed 
@@ -1371,55 +3335,67 @@ def get_actor_name(acid):
         On fail, returns None.      
         On success, returns the name of the actor.          
     """
-    with ActorsTblLock:
-        if acid in ActorsTbl.keys():
-            acname = ActorsTbl[acid].name
-        else:
-            acname=None
-    return acname
+    actor = _getActor(acid)
+    if actor==None:
+        return None
+    return actor.name
 
 
 #*******************************************
 # START/STOP ACTORS FUNCTIONS
 #*******************************************
 
-def stop_actor(acid):
-    """ Stop the execution of this actor: log out the VR avatar/agent 
-        controlled by this actor from VR simulator, disconnect
-        the actor from VR simulator and stop main script of actor.      
+def stop_actor(acid,timeout=None):
+    """ Stop the execution of this actor: cancel all scripts of the actor,
+        log out the VR avatar/agent controlled by this actor from VR 
+        simulator, disconnect the actor from VR simulator and stop main 
+        script of actor. Waits of cancelled scripts return immediately, 
+        secondary scripts still running after timeout seconds are left 
+        behind (all their actions will fail).
 
     Args:
         acid:   str with unique global identifier of actor.
+        timeout: max time in seconds to wait for secondary scripts to 
+                finish, if None uses StopScriptsTimeout.
 
     Returns:    
         On fail, returns False.     
         On success, returns True.           
     """
     global ActorsTbl, ActorsTblLock
-    with ActorsTblLock:
-        if not acid in ActorsTbl:
-            print_dbg('ac','stop_actor() failed - actor:'+acid+' is not on VR actors list')
-            return True
-        actor = ActorsTbl[acid]
+    actor = _getActor(acid)
+    if actor==None:
+        print_dbg('ac','stop_actor() failed - actor:'+acid+' is not on VR actors list')
+        return True
     actor.lock.acquire()
     if not actor.active:
         actor.lock.release()
         print_dbg('ac','stop_actor() failed - actor:'+acid+' is not active')
         return True
-    for scriptthr in actor.secthrds:
-        if scriptthr.is_alive():
-            actor.lock.release()
-            print_dbg('ac','stop_actor() failed - actor:'+acid+' has running sec scripts')
-            return False
-    print_dbg('ac','stop_actor() - will request event thread to stop')
+    print_dbg('ac','stop_actor() - will request event pump to release actor')
     actor.active = False
-    evthr = actor.evthr
+    _detachInboundHandler(actor)
+    _wakeAllWaiters(actor)
+    futures = list(actor.scripts.values())
     actor.lock.release()
-    evthr.join();
-    actor.lock.acquire()
-    print_dbg('ac','stop_actor() - event thread stopped')
+    actor.token.cancel()
+    # The current script can be one of the scripts of the actor
+    currtoken = CurrScriptToken.get()
+    futures = [fut for fut in futures if fut.token is not currtoken and not fut.cancel()]
+    if timeout==None:
+        timeout = StopScriptsTimeout
+    if len(futures)>0:
+        done, notdone = concurrent.futures.wait(futures,timeout)
+        if len(notdone)>0:
+            print_dbg('ac','stop_actor() - actor:'+acid+' has sec scripts still running')
+    actor.pumpidle.wait()
+    print_dbg('ac','stop_actor() - event pump released actor')
+    with ChannelsTblLock:
+        _unsubscribeAll(acid)
+    if CommTransport!=None:
+        CommTransport.unregister_actor(acid)
     with ActorsTblLock:
-        ActorsTbl.pop(acid,None)
+        _removeActor(acid)
     # avp = Avatars.AvatarPortal()
     # avpi = avp.Instance
     vrmng = VRAgentManager().Instance
@@ -1479,55 +3455,176 @@ def start_actor(first_name, last_name, password, vr_server_url,
             
     """
     global ActorsTbl, ActorsTblLock
+    actor, error = _loginActor(first_name,last_name,password,vr_server_url,
+                            start_loc,init_script,extra_args)
+    if actor==None:
+        return None
+    with ActorsTblLock:
+        if actor.id in ActorsTbl:
+            print_dbg('ac','start_actor() - actor already in VR actors list')
+            _detachInboundHandler(actor)
+            return None
+        _addActor(actor)
+    print_dbg('ac','start_actor() - registered actor id: '+actor.id+' in VR actors list')
+    _startEventPump()
+    _activateActor(actor,init_script,True)
+    return actor.id
+
+def _loginActor(first_name, last_name, password, vr_server_url, 
+                start_loc=None, init_script=None, extra_args=None):
+    # Log in the avatar of a new actor and build its descriptor (not yet 
+    # registered in ActorsTbl), returns (actor, None) or (None, error) 
     vrmng = VRAgentManager().Instance
     acname=first_name+' '+last_name
     print_dbg('ac','start_actor() - will login actor in VR with avatar name: '+acname)
-#    if start_location==None:
-#        acid = vrmng.vragent_login([first_name,last_name,password,server_url])
-#    else:
-#        acid = vrmng.vragent_login([first_name,last_name,password,start_location,server_url])
     if start_loc==None:
         start_loc=[]
     acid = vrmng.vragent_login([first_name,last_name,password,vr_server_url]+start_loc)
     if acid==None:
         print_dbg('ac','start_actor() - login returned None')
-        return None
+        return None, 'login failed'
     print_dbg('ac','start_actor() - login returned actor id:'+acid)
     agctl = vrmng.get_vragent_controller(acid)
     if agctl==None:
         print_dbg('ac','start_actor() - cannot get avatar controller')
-        return None
+        return None, 'cannot get avatar controller'
     agctl.SysActs.SetLogLevelAction('none')
-    with ActorsTblLock:
-        if acid in ActorsTbl:
-            print_dbg('ac','start_actor() - actor already in VR actors list')
-            return None
+    if _getActor(acid)!=None:
+        print_dbg('ac','start_actor() - actor already in VR actors list')
+        return None, 'actor already in VR actors list'
     print_dbg('ac','start_actor() - will register actor in VR actors list')
     if extra_args!=None:
         scriptargs=(acid,acname)+extra_args
     else:
         scriptargs=(acid,acname)      
-    evthrname = acname + ' events handler thread'
     mainthrname = acname + ' initial script thread'
-    evthr = threading.Thread(target=_handleAllEventsThread, name=evthrname,
-                          args=(acid,acname,agctl))
     if init_script!=None:
-        mainthr = threading.Thread(target=init_script, name=mainthrname, args=scriptargs)
+        mainthr = threading.Thread(target=_runActorScript, name=mainthrname, 
+                            args=(acid,init_script,scriptargs))
     else:
-        mainthr = threading.get_ident()
-    with ActorsTblLock:
-        ActorsTbl[acid] = ActorDescriptor(True,acid,acname,first_name,last_name,vr_server_url,
-                            agctl,mainthr,evthr)
-    print_dbg('ac','start_actor() - registered actor id: '+acid+' in VR actors list')
-    print_dbg('ac','start_actor() - will start event thread')
-    evthr.start()
-    print_dbg('ac','start_actor() - event thread started')
+        mainthr = threading.current_thread()
+    actor = ActorDescriptor(True,acid,acname,first_name,last_name,vr_server_url,
+                            agctl,mainthr)
+    if not _attachInboundHandler(actor):
+        print_dbg('ac','start_actor() - VR controller cannot notify inbound data, will poll it')
+    return actor, None
+
+def _activateActor(actor, init_script, bindcurrthr):
+    # Schedule registered actor in event pump and start its main script
+    _signalInbound(actor)
+    if CommTransport!=None:
+        CommTransport.register_actor(actor.id)
+    print_dbg('ac','start_actor() - actor scheduled in event pump')
     if init_script!=None:
         print_dbg('ac','start_actor() - will start main script thread')
-        mainthr.start()
+        actor.mainthr.start()
         print_dbg('ac','start_actor() - main script thread started')
-    else:
+    elif bindcurrthr:
+        CurrActorId.set(actor.id)
+        CurrScriptToken.set(actor.token)
         print_dbg('ac','start_actor() - using current thread as main script thread')
-    return acid
+
+def _loginActorSpec(spec):
+    # Spec is a dict with start_actor() args or a tuple/list of positional
+    # args of start_actor(), errors are isolated from other actors
+    starttm = time.monotonic()
+    try:
+        if isinstance(spec,dict):
+            actor, error = _loginActor(**spec)
+        else:
+            actor, error = _loginActor(*spec)
+    except Exception as exc:
+        actor, error = None, 'exception in login: '+repr(exc)
+    return actor, error, time.monotonic()-starttm
+
+def _specInitScript(spec):
+    if isinstance(spec,dict):
+        return spec.get('init_script')
+    if len(spec)>5:
+        return spec[5]
+    return None
+
+def _specActorName(spec):
+    try:
+        if isinstance(spec,dict):
+            return spec['first_name']+' '+spec['last_name']
+        return spec[0]+' '+spec[1]
+    except Exception:
+        return None
+
+def start_actors(specs, max_parallel=8):
+    """ Start a group of actors (a cast), logging in their VR avatars 
+        concurrently. Actors that logged in successfully are registered all
+        at once in the actors table, then their main scripts are started.
+        A failure to start some actor does not affect the other actors.
+        
+    Args:
+        specs: list (or other iterable, like a generator) with the 
+            specification of each actor, which is a dict
+            with the args of start_actor() (first_name, last_name, password,
+            vr_server_url, start_loc, init_script, extra_args) or a tuple 
+            with these args in the same order of start_actor(). 
+        max_parallel: max number of logins running at the same time.
+        
+        Actors without init_script have no main script thread, the current
+        thread is not bound to any of them.
+            
+    Returns:     
+        On fail, returns None.      
+        On success, returns a list with one result for each spec, in the 
+        same order of specs. Each result is a dict with keys:
+            'acname': name of the actor (or None if spec is malformed),
+            'acid': unique global ID of the actor, None if it failed,
+            'ok': True if the actor was started,
+            'error': str describing the failure or None,
+            'login_time': time in seconds spent in login of the actor,
+            'start_time': time in seconds from the call of start_actors()
+                until the actor was started (or failed).
+    """
+    global ActorsTbl, ActorsTblLock
+    if type(max_parallel) is not int or max_parallel<1:
+        return None
+    # Specs are used twice (logins and results), so generators are read 
+    # only once here
+    specs = list(specs)
+    starttm = time.monotonic()
+    results = []
+    actors = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_parallel,
+                            thread_name_prefix='actors login thread') as executor:
+        logins = list(executor.map(_loginActorSpec,specs))
+    for spec, (actor, error, logintm) in zip(specs,logins):
+        result = { 'acname':_specActorName(spec), 'acid':None, 'ok':False, 
+                   'error':error, 'login_time':logintm, 'start_time':None }
+        if actor!=None:
+            result['acid'] = actor.id
+        results.append(result)
+        actors.append(actor)
+    # Register all actors that logged in in a single update of actors table
+    with ActorsTblLock:
+        newactors = {}
+        for idx, actor in enumerate(actors):
+            if actor==None:
+                continue
+            if actor.id in ActorsTbl or actor.id in newactors:
+                print_dbg('ac','start_actors() - actor already in VR actors list')
+                _detachInboundHandler(actor)
+                results[idx]['error'] = 'actor already in VR actors list'
+                actors[idx] = None
+                continue
+            newactors[actor.id] = actor
+        _addActors(newactors.values())
+    print_dbg('ac','start_actors() - registered',len(newactors),'actors in VR actors list')
+    if len(newactors)>0:
+        _startEventPump()
+    for idx, actor in enumerate(actors):
+        if actor!=None:
+            try:
+                _activateActor(actor,_specInitScript(specs[idx]),False)
+                results[idx]['ok'] = True
+            except Exception as exc:
+                results[idx]['error'] = 'exception in start: '+repr(exc)
+        results[idx]['start_time'] = time.monotonic()-starttm
+    return results
 
 
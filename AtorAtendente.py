@@ -128,24 +128,26 @@ def script_principal_atendente(acid,acname,x,y):
     small_delay()
     ac.say(acid,dc.gen_speak(acid,'bomDiaTodos'))
     while(not agstop_flag):
-        # Wait for some chat message for at most 2 seconds
-        msg = ac.wait_chat_inst_msg(acid,'!'+acname,None,2)
-        if (msg==None):
+        # Wait for chat messages for at most 2 seconds, handling all
+        # messages received meanwhile
+        msgs = ac.wait_chat_inst_msgs(acid,'!'+acname,None,2)
+        if (msgs==None):
             continue
-        ac.print_dbg('atendente','chat msg: ', msg[2],' from: ',msg[1])
-        try:
-            resp = dc.process_dialog_input(acid,msg[1],msg[2])
-        except Exception as e:
-            ac.print_dbg('atendente','chat error',e)
-            resp=None
-        if resp==None:
-            resp = dc.gen_speak(acid,'NaoEntendi')
-            time.sleep(2.0)
-        ac.print_dbg('atendente','resp:',resp)
-        if msg[0]=='chatmsg':
-            ac.say(acid,resp)
-        else:
-            ac.send_inst_msg(acid,msg[1],resp)
+        for msg in msgs:
+            ac.print_dbg('atendente','chat msg: ', msg[2],' from: ',msg[1])
+            try:
+                resp = dc.process_dialog_input(acid,msg[1],msg[2])
+            except Exception as e:
+                ac.print_dbg('atendente','chat error',e)
+                resp=None
+            if resp==None:
+                resp = dc.gen_speak(acid,'NaoEntendi')
+                time.sleep(2.0)
+            ac.print_dbg('atendente','resp:',resp)
+            if msg[0]=='chatmsg':
+                ac.say(acid,resp)
+            else:
+                ac.send_inst_msg(acid,msg[1],resp)
     ac.stop_actor(acid)
 
 def start():
@@ -0,0 +1,103 @@
+###############################################################
+###############################################################
+#
+#   VirtualStage Platform - a virtual stage for virtual actors
+#
+#   Copyright (C): 2020-2023, Joao Carlos Gluz
+#   Contact:  João Carlos Gluz (jcgluz@gmail.com)
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#********************************************************
+#
+#   Module:     BenchmarkDialogTokenizers
+#   Purpose:    Benchmark of the 'nltk' and 'regex' dialog tokenizers
+#   Author:     João Carlos Gluz
+#
+###############################################################
+###############################################################
+
+
+""" Module BenchmarkDialogTokenizers - Benchmark of the 'nltk' and 'regex'
+    dialog tokenizers.
+
+    Shows the time to import nltk and load its punkt model, measured in
+    a new Python process, and the mean time to tokenize one input with
+    nltk.word_tokenize() and with the 'regex' tokenizer. The inputs are
+    the same inputs of CheckDialogTokenizers.py, which checks if both
+    tokenizers produce the same tokens.
+
+    nltk and its punkt model must be installed, see Readme.md.
+
+    Usage:
+        python BenchmarkDialogTokenizers.py [runs] [ninputs]
+
+    By default makes 5 runs with 3000 random inputs besides the fixed
+    phrases, and shows the best run.
+"""
+
+
+import sys
+import time
+import subprocess
+import ActorController as ac
+import DialogController as dc
+import CheckDialogTokenizers as chk
+
+
+NumRuns = 5
+NLTKLoadCode = ("import time; start = time.perf_counter(); import nltk; "
+    "nltk.word_tokenize('ok.'); print(time.perf_counter() - start)")
+
+
+def time_nltk_load():
+    # Returns the time (ms) to import nltk and load punkt model, or None
+    # if nltk or punkt model are not installed
+    proc = subprocess.run([sys.executable, '-c', NLTKLoadCode],
+                          capture_output=True, text=True)
+    if proc.returncode!=0:
+        return None
+    return float(proc.stdout)*1000
+
+def time_tokenizer(tokenizer, inputs, runs):
+    # Returns the best mean time (us) to tokenize one input
+    best = None
+    for run in range(runs):
+        start = time.perf_counter()
+        for input in inputs:
+            tokenizer(input)
+        elapsed = time.perf_counter() - start
+        if best==None or elapsed<best:
+            best = elapsed
+    return best*1000000/len(inputs)
+
+def main(args):
+    runs = int(args[0]) if len(args)>0 else NumRuns
+    nrandom = int(args[1]) if len(args)>1 else chk.NumRandomInputs
+    ac.print_dbg = lambda *msgs: None
+    loadtime = time_nltk_load()
+    if loadtime==None:
+        print('nltk or its punkt model are not installed, see Readme.md')
+        return 2
+    import nltk
+    inputs = [input.lower() for input in chk.gen_inputs(chk.PattsFiles, nrandom)]
+    print('Import nltk and load punkt model: %.1f ms' % loadtime)
+    print(len(inputs), 'inputs')
+    for name, tokenizer in (('nltk', nltk.word_tokenize), ('regex', dc._regexTokenizer)):
+        print('  %-6s %10.1f us/input' % (name, time_tokenizer(tokenizer, inputs, runs)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
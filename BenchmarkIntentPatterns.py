@@ -0,0 +1,166 @@
+###############################################################
+###############################################################
+#
+#   VirtualStage Platform - a virtual stage for virtual actors
+#
+#   Copyright (C): 2020-2023, Joao Carlos Gluz
+#   Contact:  João Carlos Gluz (jcgluz@gmail.com)
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#********************************************************
+#
+#   Module:     BenchmarkIntentPatterns
+#   Purpose:    Benchmark of the matching of intent patterns with and
+#               without compiled regexps
+#   Author:     João Carlos Gluz
+#
+###############################################################
+###############################################################
+
+
+""" Module BenchmarkIntentPatterns - Benchmark of the matching of intent
+    patterns with and without compiled regexps.
+
+    For each dialog patterns file, the same inputs are checked against
+    all intent patterns of the file, one pattern at a time and in file
+    order, like _findIntent() did before the combined matcher: first
+    passing the regexps as strings to _rawTokenMatcher(), then passing
+    the regexps compiled at load time. The time of the current
+    _findIntent() is also shown. The intent found for each input must
+    be the same in all cases.
+
+    nltk and its punkt model must be installed, see Readme.md.
+
+    Usage:
+        python BenchmarkIntentPatterns.py [runs] [ninputs] [pattsfile ...]
+
+    By default makes 5 runs, with 20 chat phrases plus 300 random mixes
+    of words from the patterns files, over IntencoesAprendiz.json and
+    IntencoesAtendente.json. The best run is shown as the mean time to
+    check one input.
+"""
+
+
+import sys
+import time
+import random
+import re
+import ActorController as ac
+import DialogController as dc
+
+
+PattsFiles = ['IntencoesAprendiz.json', 'IntencoesAtendente.json']
+NumRuns = 5
+NumRandomInputs = 300
+ChatInputs = ["olá", "oi tudo bem", "tchau", "meu nome é joão",
+    "qual é o seu nome", "vá para a sala", "pegue a caixa", "obrigado",
+    "bom dia", "o que você está fazendo", "siga-me", "pare",
+    "me ajude por favor", "onde fica o banheiro", "quero aprender a dançar",
+    "hello there", "xyz abc", "sente na cadeira", "olhe para mim",
+    "que horas são"]
+BenchActor = 'benchactor'
+BenchUser = 'benchuser'
+
+
+def gen_inputs(pattsfiles, nrandom):
+    # Chat phrases plus random mixes of the words found on patterns files
+    words = set()
+    for pattsfile in pattsfiles:
+        with open(pattsfile, encoding='utf-8') as pf:
+            words.update(re.findall(r"[a-zà-ú]+", pf.read().lower()))
+    words = sorted(words)
+    rnd = random.Random(7)
+    inputs = list(ChatInputs)
+    for i in range(nrandom):
+        inputs.append(" ".join(rnd.choice(words) for w in range(rnd.randint(1,8))))
+    return inputs
+
+def find_intent_by_pattern(acid, username, dlginput, compiled):
+    # Check the intent patterns one by one, with compiled regexps or
+    # with regexps as strings
+    mode = dc.get_mode(acid)
+    for intent in dc.IntentsPatternsTbl[acid]:
+        if intent.users!=None and not (username in intent.users):
+            continue
+        if intent.modes!=None and not (mode in intent.modes):
+            continue
+        for patt, cpatt in zip(intent.patterns, intent.regexps):
+            try:
+                if compiled:
+                    hits = dc._rawTokenMatcher(acid,dlginput.tkstr,patt,cpatt)
+                else:
+                    hits = dc._rawTokenMatcher(acid,dlginput.tkstr,patt)
+            except:
+                continue
+            if len(hits)>0:
+                matches = hits[0] if isinstance(hits[0],list) else [hits[0]]
+                return (intent.intentfun, matches)
+    return None
+
+def time_matcher(matcher, dlginputs, runs):
+    # Returns the intents found and the best mean time (ms) per input
+    results = [matcher(dlginput) for dlginput in dlginputs]
+    best = None
+    for run in range(runs):
+        re.purge()
+        start = time.perf_counter()
+        for dlginput in dlginputs:
+            matcher(dlginput)
+        elapsed = time.perf_counter() - start
+        if best==None or elapsed<best:
+            best = elapsed
+    return results, best*1000/len(dlginputs)
+
+def bench_patterns_file(pattsfile, inputs, runs):
+    dc.IntentsPatternsTbl[BenchActor] = dc._loadPatterns(pattsfile)
+    dc.IntentsMatcherTbl.pop(BenchActor,None)
+    dc.CurrInputMode[BenchActor] = dc.InputMode()
+    # Inputs are tokenized only once, the benchmark is about matching
+    dlginputs = [dc.DialogInput(input) for input in inputs]
+    npatts = sum(len(intent.patterns) for intent in dc.IntentsPatternsTbl[BenchActor])
+    print(pattsfile+':', npatts, 'patterns,', len(inputs), 'inputs')
+    matchers = [
+        ('string regexps', lambda d: find_intent_by_pattern(BenchActor,BenchUser,d,False)),
+        ('compiled regexps', lambda d: find_intent_by_pattern(BenchActor,BenchUser,d,True)),
+        ('_findIntent()', lambda d: dc._findIntent(BenchActor,BenchUser,d))
+    ]
+    baseresults = None
+    ok = True
+    for name, matcher in matchers:
+        results, mstime = time_matcher(matcher, dlginputs, runs)
+        nfound = sum(result!=None for result in results)
+        print('  %-18s %10.3f ms/input   %d intents found' % (name, mstime, nfound))
+        if baseresults==None:
+            baseresults = results
+        elif results!=baseresults:
+            ok = False
+            ndiffs = sum(r!=b for r, b in zip(results, baseresults))
+            print('  ERROR:', name, 'found different intents for', ndiffs, 'inputs')
+    return ok
+
+def main(args):
+    runs = int(args[0]) if len(args)>0 else NumRuns
+    nrandom = int(args[1]) if len(args)>1 else NumRandomInputs
+    pattsfiles = args[2:] if len(args)>2 else PattsFiles
+    ac.print_dbg = lambda *msgs: None
+    inputs = gen_inputs(pattsfiles, nrandom)
+    ok = True
+    for pattsfile in pattsfiles:
+        ok = bench_patterns_file(pattsfile, inputs, runs) and ok
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
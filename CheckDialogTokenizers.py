@@ -0,0 +1,177 @@
+###############################################################
+###############################################################
+#
+#   VirtualStage Platform - a virtual stage for virtual actors
+#
+#   Copyright (C): 2020-2023, Joao Carlos Gluz
+#   Contact:  João Carlos Gluz (jcgluz@gmail.com)
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#********************************************************
+#
+#   Module:     CheckDialogTokenizers
+#   Purpose:    Check if the 'regex' dialog tokenizer produces the same
+#               tokens and dialog decisions of the 'nltk' tokenizer
+#   Author:     João Carlos Gluz
+#
+###############################################################
+###############################################################
+
+
+""" Module CheckDialogTokenizers - Check if the 'regex' dialog tokenizer
+    produces the same tokens and dialog decisions of the 'nltk' tokenizer.
+
+    The inputs are chat phrases, phrases with abbreviations, initials
+    and numbers followed by periods, and random mixes of the words found
+    on the patterns files, with punctuation marks. For each input, the
+    tokens of nltk.word_tokenize() are compared with the tokens of the
+    'regex' tokenizer, and then the intents found on the dialog patterns
+    files, in each input mode of these files, and the talks of the
+    hear-talk rules files, are compared. The inputs that differ are shown.
+
+    nltk and its punkt model must be installed, see Readme.md.
+
+    Usage:
+        python CheckDialogTokenizers.py [ninputs]
+
+    By default, checks 3000 random inputs besides the fixed phrases.
+    Returns 0 if the tokens and decisions are always the same, 1 if
+    some of them differ, or 2 if nltk or punkt model are not installed.
+"""
+
+
+import sys
+import random
+import re
+import ActorController as ac
+import DialogController as dc
+
+
+PattsFiles = ['IntencoesAprendiz.json', 'IntencoesAtendente.json',
+    'ChatterPatterns.json']
+ProdRulesFiles = ['BatePaposAprendiz.json', 'BatePaposAtendente.json',
+    'ChatterChats.json']
+NumRandomInputs = 3000
+MaxShownDiffs = 10
+ChatInputs = ["olá", "oi, tudo bem?", "meu nome é joão.", "qual é o seu nome?",
+    "vá para a sala, por favor", "siga-me!", "pegue a caixa e traga-a aqui",
+    "são 12:30 e custa 1,5 reais", "\"oi\" disse ele (rindo)", "d'água",
+    "ok... até logo", "e-mail: a@b.com", "tá bom; obrigado :)",
+    "hello, what's up?", "i don't know", "I'm fine, thanks!", "2+2=4?",
+    "quero consultar com a dr. silva", "quero consultar com o dr.",
+    "a dra. ana está?", "o sr. joão chegou", "a sra. maria e a srta. ana",
+    "o prof. carlos e a profa. ana", "item 2. casa", "às 10 a.m. ok",
+    "j. bach", "o dr. x.", "a consulta (com o dr.) foi boa", "fim.) ok",
+    "o dr. silva?! sim", "e.g. isto", "vs. eles"]
+PunctMarks = ['', ',', '.', '?', '!', '...', '?!', ';', ':']
+CheckActor = 'checkactor'
+CheckUser = 'checkuser'
+
+
+def gen_inputs(files, nrandom):
+    # Chat phrases plus random mixes of the words found on patterns files
+    words = set()
+    for file in files:
+        with open(file, encoding='utf-8') as pf:
+            words.update(re.findall(r"[a-zà-úç]+", pf.read().lower()))
+    words = sorted(words)
+    rnd = random.Random(5)
+    inputs = list(ChatInputs)
+    for abbrev in sorted(dc.RegexTokenizerAbbrevs):
+        inputs.append('o '+abbrev+'. silva chegou')
+    for i in range(nrandom):
+        wrds = []
+        for w in range(rnd.randint(1,8)):
+            punct = rnd.choice(PunctMarks) if rnd.random()<0.3 else ''
+            wrds.append(rnd.choice(words)+punct)
+        inputs.append(" ".join(wrds))
+    return inputs
+
+def show_diffs(title, diffs, total):
+    print(title+':', total-len(diffs), 'of', total, 'identical')
+    for diff in diffs[:MaxShownDiffs]:
+        print('   ', ' | '.join(repr(d) for d in diff))
+    return len(diffs)==0
+
+def check_tokens(inputs, nltktok):
+    diffs = []
+    for input in inputs:
+        nltktks = nltktok(input.lower())
+        regextks = dc._regexTokenizer(input.lower())
+        if nltktks!=regextks:
+            diffs.append((input, nltktks, regextks))
+    return show_diffs('Tokens', diffs, len(inputs))
+
+def check_intents(pattsfile, inputs, nltktok):
+    dc.IntentsPatternsTbl[CheckActor] = dc._loadPatterns(pattsfile)
+    dc.IntentsMatcherTbl.pop(CheckActor,None)
+    dc.CurrInputMode[CheckActor] = dc.InputMode()
+    modes = set()
+    for intent in dc.IntentsPatternsTbl[CheckActor]:
+        if intent.modes!=None:
+            modes.update(intent.modes)
+    diffs = []
+    total = 0
+    for mode in [None]+sorted(modes):
+        dc.CurrInputMode[CheckActor].mode = mode
+        for input in inputs:
+            nltkres = dc._findIntent(CheckActor,CheckUser,dc.DialogInput(input,nltktok))
+            regexres = dc._findIntent(CheckActor,CheckUser,
+                            dc.DialogInput(input,dc._regexTokenizer))
+            total += 1
+            if nltkres!=regexres:
+                diffs.append((mode, input, nltkres, regexres))
+    return show_diffs('Intents of '+pattsfile, diffs, total)
+
+def check_prod_rules(prodsfile, inputs, nltktok):
+    dc.ProdRulesTbl[CheckActor] = dc._loadProdRules(prodsfile)
+    diffs = []
+    for n, input in enumerate(inputs):
+        # Talks are randomly chosen, so both tokenizers must make
+        # the same choices
+        random.seed(n)
+        nltkres = dc._applyProdRules(CheckActor,CheckUser,dc.DialogInput(input,nltktok))
+        random.seed(n)
+        regexres = dc._applyProdRules(CheckActor,CheckUser,
+                        dc.DialogInput(input,dc._regexTokenizer))
+        if nltkres!=regexres:
+            diffs.append((input, nltkres, regexres))
+    return show_diffs('Talks of '+prodsfile, diffs, len(inputs))
+
+def main(args):
+    nrandom = int(args[0]) if len(args)>0 else NumRandomInputs
+    ac.print_dbg = lambda *msgs: None
+    try:
+        import nltk
+        nltk.word_tokenize('ok.')
+    except ImportError:
+        print('nltk is not installed, install it with: pip install nltk')
+        return 2
+    except LookupError:
+        print("nltk punkt model is not installed, install it with",
+              "nltk.download('punkt_tab') or, in nltk versions older",
+              "than 3.9, with nltk.download('punkt')")
+        return 2
+    inputs = gen_inputs(PattsFiles, nrandom)
+    ok = check_tokens(inputs, nltk.word_tokenize)
+    for pattsfile in PattsFiles:
+        ok = check_intents(pattsfile, inputs, nltk.word_tokenize) and ok
+    for prodsfile in ProdRulesFiles:
+        ok = check_prod_rules(prodsfile, inputs, nltk.word_tokenize) and ok
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -35,7 +35,9 @@
         wait_msg(acid,msgpatt,timeout)
         wait_inst_msg(acid, srcnam, cntntpatt, timeout)
         wait_chat_msg(acid, srcnam, cntntpatt, timeout)
+        async_wait_chat_msg(acid, srcnam, cntntpatt, timeout)
         wait_chat_inst_msg(acid, srcnam, chattyp, cntntpatt, timeout)
+        wait_chat_inst_msgs(acid, srcnam, cntntpatt, timeout, max_batch=None)
         wait_shout_msg(acid, srcnam, cntntpatt, timeout)
         wait_say_msg(acid, srcnam, cntntpatt, timeout)
         wait_whisper_msg(acid, srcnam, cntntpatt, timeout)
@@ -212,6 +214,12 @@ def wait_chat_msg(acid, srcnam, cntntpatt, timeout):
 
     return ac.wait_vrmsg(acid,['chatmsg',srcnam,cntntpatt],timeout)
 
+async def async_wait_chat_msg(acid, srcnam, cntntpatt, timeout):
+    """ Coroutine version of wait_chat_msg(), to be awaited in an asyncio 
+        event loop, see wait_chat_msg() for args and results.
+    """
+    return await ac.async_wait_vrmsg(acid,['chatmsg',srcnam,cntntpatt],timeout)
+
 def wait_chat_inst_msg(acid, srcnam, cntntpatt, timeout):
     """ Wait for an instant or chat message sent by some avatar/agent
         with name srcnam and with content that match cntntpatt. 
@@ -249,6 +257,36 @@ def wait_chat_inst_msg(acid, srcnam, cntntpatt, timeout):
 
     return ac.wait_vrmsg(acid,['instmsg|chatmsg',srcnam,cntntpatt],timeout)
 
+def wait_chat_inst_msgs(acid, srcnam, cntntpatt, timeout, max_batch=None):
+    """ Wait for instant or chat messages sent by some avatar/agent
+        with name srcnam and with content that match cntntpatt, returning
+        all of them at once. Blocks until at least one message arrives
+        (or until timeout seconds, if timeout is different than None), 
+        then returns every matching message currently received.
+        
+    See the help of wait_chat_inst_msg() for a description of srcnam
+    and cntntpatt args.
+
+    Args:
+
+        acid:       str with unique global identifier of actor.
+        srcnam:     if different than None, is a string that defines the name 
+                    of avatar/agent that sent the message.
+        cntntpatt:  if different than None, is a pattern string that must match
+                    the content of the message.
+        timeout:    if different than None, defines the maximum time in seconds
+                    to wait for the first message.
+        max_batch:  if different than None, defines the maximum number of 
+                    messages returned.
+
+    Returns:
+     
+        On fail, returns None.      
+        On success, returns a list of messages, in order of arrival.           
+    """
+
+    return ac.wait_vrmsgs(acid,['instmsg|chatmsg',srcnam,cntntpatt],timeout,max_batch)
+
 def wait_shout_msg(acid, srcnam, cntntpatt, timeout):
     """ Wait for a chat message of type 'shout', i.e., a message 'shouted' in
         chat channel by some avatar/agent with name srcnam  and with content 
@@ -93,6 +93,10 @@
             set_dialog_hear_talk_rules_file(acid, prodrulesfile)
             set_dialog_aiml_files(acid, aimlfiles)
         
+        Optionally, the tokenizer used to split the user input in tokens
+        can be selected by function:
+            set_dialog_tokenizer(acid, tokenizer)
+        
         Then the dialog system must be initialized calling the function:
             init_dialog_system(acid)
         
@@ -123,10 +127,12 @@
             set_dialog_speeches_file(acid, speechesfile)
             set_dialog_hear_talk_rules_file(acid, prodrulesfile)
             set_dialog_aiml_files(acid, aimlfiles)
+            set_dialog_tokenizer(acid, tokenizer)
             init_dialog_system(acid)
         
         Input processing:
             process_dialog_input(acid,username,userinput)
+            async_process_dialog_input(acid,username,userinput)
         
         Discussion topic service: 
             get_topic_name(acid)
@@ -173,7 +179,8 @@ import sys
 import threading
 import itertools
 import importlib
-import nltk
+import inspect
+import bisect
 import aiml
 import random
 import time
@@ -185,6 +192,18 @@ import ActorController as ac
 #*******************************************
 
 #DTLock = threading.Lock()
+# Blocks of combined intent patterns where more than 1/CombinedMatchRatio
+# of the patterns are candidates are searched with the combined regexp of 
+# the block, otherwise the candidate patterns are matched one by one
+CombinedMatchRatio = 3
+# Tokenizer used by actors that did not select one
+DefaultDialogTokenizer = 'nltk'
+# Abbreviations that keep their period in the 'regex' tokenizer, like 
+# the abbreviations of the english punkt model used by nltk.word_tokenize()
+RegexTokenizerAbbrevs = {'dr', 'mr', 'mrs', 'ms', 'jr', 'sr', 'st', 'prof', 
+    'vs', 'inc', 'co', 'corp', 'ltd', 'gen', 'gov', 'sen', 'rep', 'e.g', 
+    'i.e', 'a.m', 'p.m', 'u.s'}
+DialogTokenizer = {}
 IntentsPatternsFile = {}
 IntentsFunctionsFile = {}
 SpeechesFile = {}
@@ -196,8 +215,11 @@ AIMLFiles = {}
 #*******************************************
 
 IntentsPatternsTbl = {}
+IntentsMatcherTbl = {}
 IntentsFunctionsTbl = {}
 ProdRulesTbl = {}
+ProdRulesMatcherTbl = {}
+IntentsWantInputTbl = {}
 AIMLKrnlTbl = {}
 
 #*******************************************
@@ -263,7 +285,23 @@ def _preprocessTokenRegExp(tkregexp):
     #ac.print_dbg('dc',"patt rawregexp=",regexp)
     return regexp
 
-def _rawTokenMatcher(acid, tkstr, regexp):
+def _compileTokenRegExp(regexp):
+    # Compile a preprocessed token regular expression. Patterns with
+    # memory vars enclosed in '%' depend on the actor memory at match 
+    # time, and patterns that are not valid regexps must keep failing 
+    # at match time, so in both cases returns None to keep the string
+    if re.search("%([a-zA-Z][-a-zA-Z0-9]*)%",regexp)!=None:
+        return None
+    try:
+        return re.compile(regexp)
+    except re.error:
+        return None
+
+def _rawTokenMatcher(acid, tkstr, regexp, cregexp=None):
+    # Token regular expression already compiled at load time, 
+    # so no memory var can be present, perform the search directly
+    if cregexp!=None:
+        return _tokenHits(tkstr, regexp, cregexp.findall(tkstr))
     # First replace memory vars enclosed in '%' by their values
     varnames = re.findall("%([a-zA-Z][-a-zA-Z0-9]*)%",regexp)
     for var in varnames:
@@ -280,6 +318,9 @@ def _rawTokenMatcher(acid, tkstr, regexp):
     # Token regular expression must already be preprocessed
     # to perform the search
     tkhits = re.findall(regexp, tkstr)
+    return _tokenHits(tkstr, regexp, tkhits)
+
+def _tokenHits(tkstr, regexp, tkhits):
     #ac.print_dbg('dc',"tkhits=",tkhits)
     # Sanity check and postprocessing
     if tkhits==None or tkhits==[]:
@@ -362,19 +403,250 @@ def _tokenMatcher(acid, tkstr, tkregexp):
     hits = _rawTokenMatcher(acid, tkstr, regexp)
     return hits
 
+#*******************************************
+# INDEX OF LITERAL TOKENS REQUIRED BY
+# TOKEN PATTERNS
+#*******************************************
+
+def _requiredTokens(tkregexp):
+    # Returns the list of literal tokens required by a token regular 
+    # expression, as a list of sets of alternative tokens, one set for 
+    # each token like <olá|ola> that is at top level of the expression 
+    # and is not optional. Any token string matched by the expression has
+    # at least one token of each set. Tokens inside groups are ignored, 
+    # as well as all tokens of expressions with alternatives at top level
+    tkregexp = re.sub(r"\s", "", tkregexp)
+    required = []
+    depth = 0
+    inclass = False
+    i = 0
+    while i<len(tkregexp):
+        c = tkregexp[i]
+        if c=='\\':
+            i += 1
+        elif inclass:
+            inclass = c!=']'
+        elif c=='[':
+            inclass = True
+        elif c=='(':
+            depth += 1
+        elif c==')':
+            depth -= 1
+        elif c=='|' and depth==0:
+            return []
+        elif c=='<':
+            j = tkregexp.find('>',i)
+            if j<0:
+                return []
+            tkspec = tkregexp[i+1:j]
+            if tkspec.count('(')!=tkspec.count(')'):
+                return []
+            i = j
+            if depth>0 or (j+1<len(tkregexp) and tkregexp[j+1] in '*?{'):
+                # Token inside group or optional token
+                pass
+            elif re.fullmatch(r"(?:[^\W_]|-)+(?:\|(?:[^\W_]|-)+)*",tkspec)!=None:
+                required.append(frozenset(tkspec.split('|')))
+        i += 1
+    return required
+
+def _inputTokens(tkstr):
+    # Returns the set of all strings enclosed by '<' and '>' in the token
+    # string, which includes any literal token that can be matched there 
+    return set(re.findall(r"<([^<>]*)>",tkstr))
+
+class TokensIndex:
+    """__init__() class constructor"""
+    def __init__(self):
+        # Inverted index from a literal token to the numbers of the patterns 
+        # that require it, each pattern is indexed by the smallest of its 
+        # sets of required tokens
+        self.index = {}
+        # Other sets of required tokens of each pattern, by pattern number
+        self.others = []
+        # Numbers of the patterns without required tokens
+        self.always = []
+    
+    def add(self,tkregexp):
+        # Add the next token pattern to the index and returns its number 
+        patnum = len(self.others)
+        required = _requiredTokens(tkregexp)
+        if len(required)==0:
+            self.others.append([])
+            self.always.append(patnum)
+        else:
+            keytks = min(required,key=len)
+            self.others.append([reqtks for reqtks in required if reqtks is not keytks])
+            for token in keytks:
+                self.index.setdefault(token,[]).append(patnum)
+        return patnum
+
+    def candidates(self,tokens):
+        # Returns the sorted list of numbers of patterns that can match a 
+        # token string with this set of tokens
+        cands = set(self.always)
+        for token in tokens:
+            patnums = self.index.get(token)
+            if patnums==None:
+                continue
+            for patnum in patnums:
+                if patnum in cands:
+                    continue
+                for reqtks in self.others[patnum]:
+                    if reqtks.isdisjoint(tokens):
+                        break
+                else:
+                    cands.add(patnum)
+        return sorted(cands)
+
+#*******************************************
+# TOKENIZERS OF USER INPUT
+#*******************************************
+
+# A tokenizer is any function that receives a string and returns the
+# list of tokens (strings) of this string
+
+def _nltkTokenizer(text):
+    # nltk is only imported when its tokenizer is used, because nltk and
+    # its punkt model are slow to load
+    import nltk
+    return nltk.word_tokenize(text)
+
+# Tokens of chat input in Portuguese and English, following the same 
+# rules of nltk.word_tokenize(): punctuation marks and quotes, like 
+# . , ; : ? ! ( ) " * @ # $ % &, are single tokens, as well as sequences
+# of periods (...) or backquotes; other symbols and periods, commas and 
+# colons followed by digits or letters (as in 1,5, 12:30 and b.com) are 
+# kept inside words; and English contractions like don't and it's are 
+# split in do n't and it 's. The periods after words that do not end a 
+# sentence, like the period of dr. in "o dr. silva", are joined to these 
+# words by _regexTokenizer()
+_RegexTokenizerRE = re.compile(r"""
+      \.{2,}
+    | `+
+    | ''
+    | --
+    | \w+(?=n't\b)
+    | n't\b
+    | '(?:s|m|d|ll|re|ve)\b
+    | '(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)
+    | (?:[^\s.,;:@\#$%&?!*()\[\]{}<>"'`«»“”‘’„\u2012-\u2015-]
+        | -(?!-)
+        | \.(?=[^\s.])
+        | [,:](?=\d)
+        | '(?!(?:s|m|d|ll|re|ve)\b)(?=\w)
+      )+
+    | \S
+    """, re.VERBOSE | re.IGNORECASE)
+
+# Final period of the text, which can be followed by closing brackets
+# and quotes, and periods followed by closing brackets and quotes
+_RegexTokenizerEndRE = re.compile(r"""[\]\)}>"']*\s*$""")
+_RegexTokenizerCloseRE = re.compile(r"""[\]\)}>"']*\s*$|["')\]}]+\s""")
+# Initials and numbers
+_RegexTokenizerInitialRE = re.compile(r"[^\W\d]$")
+_RegexTokenizerNumberRE = re.compile(r"-?[.,]?\d[\d,.-]*$")
+# Next word followed by ?! or !! or similar, punkt ends the sentence 
+# before this word
+_RegexTokenizerBreakRE = re.compile(r"\s*[^\s?!]+[?!]{2}")
+
+def _regexKeepsPeriod(word, text, end):
+    # Check if the period just after word, that ends at end position of 
+    # text, belongs to the word. nltk.word_tokenize() only splits from 
+    # words the periods that end sentences, and, in lowercase text, the 
+    # punkt model does not end sentences at abbreviations, or at initials 
+    # and numbers followed by a lowercase word
+    if _RegexTokenizerEndRE.match(text,end)!=None or \
+            _RegexTokenizerBreakRE.match(text,end)!=None:
+        return False
+    word = word.lower()
+    if word in RegexTokenizerAbbrevs or word.split('-')[-1] in RegexTokenizerAbbrevs:
+        return True
+    if _RegexTokenizerInitialRE.match(word)!=None or _RegexTokenizerNumberRE.match(word)!=None:
+        nextchar = text[end:].lstrip()[:1]
+        return nextchar.islower() or nextchar in ';:,!?'
+    return False
+
+def _regexTokenizer(text):
+    # Lightweight tokenizer based on a single regexp, double quotes are
+    # converted to `` and '' like nltk does
+    tokens = []
+    prevend = -1
+    for m in _RegexTokenizerRE.finditer(text):
+        token = m.group()
+        start = m.start()
+        if token=='"':
+            if start==0 or text[start-1].isspace() or text[start-1] in '([{<':
+                token = '``'
+            else:
+                token = "''"
+        elif token=='.':
+            # Period just after a word
+            if prevend==start and tokens[-1][-1].isalnum() and \
+                    _regexKeepsPeriod(tokens[-1],text,m.end()):
+                tokens[-1] += token
+                prevend = m.end()
+                continue
+        elif token[-1]=='.' and len(token)>1 and token[-2]!='.' and \
+                _RegexTokenizerCloseRE.match(text,m.end())!=None and \
+                not _regexKeepsPeriod(token[:-1],text,m.end()):
+            # Period that ends a sentence, followed by closing brackets or quotes
+            tokens.append(token[:-1])
+            token = '.'
+        tokens.append(token)
+        prevend = m.end()
+    return tokens
+
+DialogTokenizers = {
+    'nltk': _nltkTokenizer,
+    'regex': _regexTokenizer
+}
+
+def _asTokenizer(tokenizer):
+    # Tokenizers are given by name or as functions
+    if isinstance(tokenizer,str):
+        return DialogTokenizers[tokenizer]
+    return tokenizer
+
+def _getTokenizer(acid):
+    return _asTokenizer(DialogTokenizer.get(acid,DefaultDialogTokenizer))
+
+#*******************************************
+# OBJECT REPRESENTATION OF USER INPUT
+#*******************************************
+
+class DialogInput:
+    """__init__() class constructor"""
+    def __init__(self,userinput,tokenizer=None):
+        # The user input is lowercased and tokenized only once for each
+        # dialog turn, and shared by all dialog processors. Without a 
+        # tokenizer, the DefaultDialogTokenizer is used
+        if tokenizer==None:
+            tokenizer = _asTokenizer(DefaultDialogTokenizer)
+        self.text = userinput
+        self.lowertext = userinput.lower()
+        self.tokens = tokenizer(self.lowertext)
+        self.tkstr = _toTokenString(self.tokens)
+        # Set of tokens used to select the candidate token patterns
+        self.tkset = _inputTokens(self.tkstr)
+
 #*******************************************
 # OBJECT REPRESENTATION OF INTENT PATTERNS
 #*******************************************
 
 class IntentPatterns:
     """__init__() class constructor"""
-    def __init__(self,origintent,intentfun,users,modes,patterns,origpatterns):
+    def __init__(self,origintent,intentfun,users,modes,patterns,origpatterns,regexps=None):
         self.origintent = origintent
         self.intentfun = intentfun
         self.users = users
         self.modes = modes
         self.patterns = patterns
         self.origpatterns = origpatterns
+        # Compiled patterns, None for patterns that must be matched as strings
+        if regexps==None:
+            regexps = [None]*len(patterns)
+        self.regexps = regexps
 
 #*******************************************
 # AUXILIARY FUNCTIONS USED TO LOAD INTENT 
@@ -406,10 +678,168 @@ def _asIntentPatterns(jsdict):
     splitint = _splitIntent(intent)
     patlist = ipatlist[0][1]
     procpatlist=[]
+    regexplist=[]
     for pat in patlist:
-        procpatlist.append(_preprocessTokenRegExp(pat))        
-    return IntentPatterns(intent,splitint[0],splitint[1],splitint[2],procpatlist,patlist)
+        procpat = _preprocessTokenRegExp(pat)
+        procpatlist.append(procpat)
+        regexplist.append(_compileTokenRegExp(procpat))
+    return IntentPatterns(intent,splitint[0],splitint[1],splitint[2],procpatlist,patlist,
+                            regexplist)
     
+#*******************************************
+# COMBINED MATCHER OF INTENT PATTERNS
+#*******************************************
+
+class IntentsMatcher:
+    """__init__() class constructor"""
+    def __init__(self,blocks,index):
+        self.blocks = blocks
+        # Index of required tokens of the patterns, patterns are numbered 
+        # in file order
+        self.index = index
+
+class IntentsBlock:
+    """__init__() class constructor"""
+    def __init__(self,intent,regexp,entries):
+        # Number of the first pattern of the block, set by the matcher
+        self.first = 0
+        # First intent of the block, all intents of the block have the
+        # same users and modes, so it is used to check these filters
+        self.intent = intent
+        # Combined compiled regexp of all patterns of the block, or None
+        # for a block with a single pattern that must be matched alone 
+        self.regexp = regexp
+        # List of (intent,patt,origpatt,cpatt,group,ngroups) tuples, in 
+        # file order, where group is the number of the first group of the 
+        # pattern in the combined regexp and ngroups is the number of 
+        # groups of the pattern
+        self.entries = entries
+
+def _isAnchoredPattern(patt):
+    # Check if the pattern starts with '^' and has no alternatives at top
+    # level, so it can only match at the start of the token string
+    if not patt.startswith('^'):
+        return False
+    depth = 0
+    inclass = False
+    escaped = False
+    for c in patt:
+        if escaped:
+            escaped = False
+        elif c=='\\':
+            escaped = True
+        elif inclass:
+            inclass = c!=']'
+        elif c=='[':
+            inclass = True
+        elif c=='(':
+            depth += 1
+        elif c==')':
+            depth -= 1
+        elif c=='|' and depth==0:
+            return False
+    return True
+
+def _isCombinablePattern(patt,cpatt):
+    # Only compiled patterns anchored at the start of the token string are
+    # combined. Patterns that have named groups, backrefs, conditional
+    # groups or global inline flags cannot be renumbered and joined in a
+    # combined regexp. The other patterns are searched alone, which lets 
+    # the re module use the literal prefix of each one to speed the search 
+    if cpatt==None or len(cpatt.groupindex)>0 or cpatt.flags!=re.UNICODE:
+        return False
+    if re.search(r"\\[1-9]|\(\?P=|\(\?\(",patt)!=None:
+        return False
+    return _isAnchoredPattern(patt)
+
+def _combineIntentsBlock(run):
+    # The anchored patterns are joined in file order as alternatives of a
+    # single regexp, and each alternative ends with an empty named group
+    # that marks which pattern matched. Alternatives are tried in order at
+    # the start of the token string, so the first one that matches, and its 
+    # groups, are the same first pattern and first hit found by re.findall()
+    alts = []
+    entries = []
+    ngroups = 0
+    for intent, patt, origpatt, cpatt in run:
+        alts.append(patt+'(?P<p'+str(len(entries))+'>)')
+        entries.append((intent,patt,origpatt,cpatt,ngroups+1,cpatt.groups))
+        ngroups = ngroups+cpatt.groups+1
+    try:
+        regexp = re.compile('|'.join(alts))
+    except Exception as error:
+        ac.print_dbg('dc','Cannot combine intent patterns ', error)
+        # Keep each pattern in its own block
+        return [IntentsBlock(entry[0],None,[entry]) for entry in entries]
+    return [IntentsBlock(run[0][0],regexp,entries)]
+
+def _buildIntentsMatcher(dlgpatts):
+    # Join consecutive patterns of intents with the same users and modes
+    # in combined blocks, patterns that cannot be combined stay alone in
+    # its own block, keeping the file order of the patterns. Also index 
+    # the literal tokens required by each pattern
+    blocks = []
+    run = []
+    index = TokensIndex()
+    for intent in dlgpatts:
+        for origpatt in intent.origpatterns:
+            index.add(origpatt)
+    for intent in dlgpatts:
+        if len(run)>0 and (run[0][0].users!=intent.users or run[0][0].modes!=intent.modes):
+            blocks += _combineIntentsBlock(run)
+            run = []
+        for patt, origpatt, cpatt in zip(intent.patterns, intent.origpatterns, intent.regexps):
+            if _isCombinablePattern(patt,cpatt):
+                run.append((intent,patt,origpatt,cpatt))
+                continue
+            if len(run)>0:
+                blocks += _combineIntentsBlock(run)
+                run = []
+            blocks.append(IntentsBlock(intent,None,[(intent,patt,origpatt,cpatt,0,0)]))
+    if len(run)>0:
+        blocks += _combineIntentsBlock(run)
+    first = 0
+    for block in blocks:
+        block.first = first
+        first += len(block.entries)
+    return IntentsMatcher(blocks,index)
+
+class ProdRulesMatcher:
+    """__init__() class constructor"""
+    def __init__(self,prods):
+        # Hear-talk rules list used to build the matcher, and its length
+        self.prods = prods
+        self.nprods = len(prods)
+        # List of (prodnum,origpatt,patt,cpatt) tuples with the hear patterns
+        # of the rules, preprocessed and compiled, in the order of the rules
+        self.entries = []
+        self.index = TokensIndex()
+        for prodnum, pr in enumerate(prods):
+            hear_patts = pr['hear']
+            if hear_patts==None:
+                continue
+            for origpatt in hear_patts:
+                patt = _preprocessTokenRegExp(origpatt)
+                self.entries.append((prodnum,origpatt,patt,_compileTokenRegExp(patt)))
+                self.index.add(origpatt)
+
+def _matchIntentsBlock(tkstr,block):
+    # Returns the entry of first pattern of the block that matches the 
+    # token string and the hits of this pattern, or None
+    m = block.regexp.match(tkstr)
+    if m==None:
+        return None
+    entry = block.entries[int(m.lastgroup[1:])]
+    group, ngroups = entry[4], entry[5]
+    # Build the first hit exactly as re.findall() does
+    if ngroups==0:
+        tkhit = m.group(0)
+    elif ngroups==1:
+        tkhit = m.group(group) or ''
+    else:
+        tkhit = tuple(m.group(g) or '' for g in range(group,group+ngroups))
+    return (entry, _tokenHits(tkstr, entry[1], [tkhit]))
+
 def _loadPatterns(pattfile):
     try: 
         with open(pattfile, encoding='utf-8') as pf:
@@ -444,105 +874,144 @@ def _loadSpeeches(speechesfile):
 #*******************************************
     
     
-def _findIntent(acid,username,userinput):
+def _findIntent(acid,username,dlginput):
     #DTLock.acquire()
-    global IntentsPatternsTbl, IntentsFunctionsTbl   
-    dlgpatts = IntentsPatternsTbl[acid]
-    tkstrinput = _toTokenString( nltk.word_tokenize(userinput.lower()) )
-    for intent in dlgpatts:
-        #ac.print_dbg('dc','will check patterns')
-        #intfunmod=intpatts.intent.split('@')
-        #ac.print_dbg('dc','intfunmod=',intfunmod)
-        #intentfun = intfunmod[0]
+    global IntentsPatternsTbl, IntentsMatcherTbl, IntentsFunctionsTbl   
+    matcher = IntentsMatcherTbl.get(acid)
+    if matcher==None:
+        matcher = _buildIntentsMatcher(IntentsPatternsTbl[acid])
+        IntentsMatcherTbl[acid] = matcher
+    tkstrinput = dlginput.tkstr
+    # Only patterns with all required literal tokens present in the input
+    # can match it, these are the candidate patterns
+    cands = matcher.index.candidates(dlginput.tkset)
+    if len(cands)==0:
+        return None
+    mode = get_mode(acid)
+    for block in matcher.blocks:
+        # Candidate patterns of this block
+        lo = bisect.bisect_left(cands,block.first)
+        hi = bisect.bisect_left(cands,block.first+len(block.entries))
+        if lo==hi:
+            continue
+        intent = block.intent
         if intent.users!=None and not (username in intent.users):
             # The intention is specific for some set of users, but current
             # user does not belong to this set, so continue the search 
             continue       
-        #ac.print_dbg('dc','intentfun=',intentfun,' intentmode=',intentmode)
-        if intent.modes!=None and not (get_mode(acid) in intent.modes):
+        if intent.modes!=None and not (mode in intent.modes):
             # The intention is specific for some mode or modes, but current
             # dialog mode is not one of these modes, so continue the search 
             continue
-        #ac.print_dbg('dc','checking intent: ',intent.intentfun)
-        #for patt in intent.patterns:
-        for patt, origpatt in zip(intent.patterns, intent.origpatterns):
-            #ac.print_dbg('dc','input: "', tkstrinput,'"')
-            #ac.print_dbg('dc','origpatt: "',origpatt,'"')
-            #ac.print_dbg('dc','patt: "',patt,'"')
+        if block.regexp!=None and (hi-lo)*CombinedMatchRatio>len(block.entries):
+            # Find the first pattern of the block that matches the input
+            # with a single match of the combined regexp of the block
+            result = _matchIntentsBlock(tkstrinput,block)
+            if result==None:
+                continue
+            entry, hits = result
+            matches = hits[0] if isinstance(hits[0],list) else [hits[0]]
+            #DTLock.release()
+            return (entry[0].intentfun, matches)    
+        # Check candidate patterns of the block one by one
+        for cand in cands[lo:hi]:
+            entry = block.entries[cand-block.first]
             try:
-                hits = _rawTokenMatcher(acid,tkstrinput,patt)
+                hits = _rawTokenMatcher(acid,tkstrinput,entry[1],entry[3])
             except:
-                ac.print_dbg('dc','Error checking intent: ',intent.intentfun,' with input: "', tkstrinput,'"')
-                ac.print_dbg('dc','  orig patt: "',origpatt,'"')
-                ac.print_dbg('dc','  raw  patt: "',patt,'"')
+                ac.print_dbg('dc','Error checking intent: ',entry[0].intentfun,' with input: "', tkstrinput,'"')
+                ac.print_dbg('dc','  orig patt: "',entry[2],'"')
+                ac.print_dbg('dc','  raw  patt: "',entry[1],'"')
                 continue
             if len(hits)>0:
                 matches = hits[0] if isinstance(hits[0],list) else [hits[0]]
                 #DTLock.release()
-                #ac.print_dbg('dc','matched intent: ',intent.intentfun,' hits: ',matches)
-                return (intent.intentfun, matches)    
+                #ac.print_dbg('dc','matched intent: ',entry[0].intentfun,' hits: ',matches)
+                return (entry[0].intentfun, matches)    
     #DTLock.release()
     return None
 
-def _execIntentAction(acid,username,userinput,intent,matches):
+def _wantsDialogInput(actFunction):
+    # Check, only once for each intent function, if the function has
+    # the optional dlginput argument
+    wants = IntentsWantInputTbl.get(actFunction)
+    if wants==None:
+        try:
+            wants = 'dlginput' in inspect.signature(actFunction).parameters
+        except (TypeError, ValueError):
+            wants = False
+        IntentsWantInputTbl[actFunction] = wants
+    return wants
+
+def _execIntentAction(acid,username,userinput,intent,matches,dlginput=None):
     #DTLock.acquire()
     global IntentsPatternsTbl, IntentsFunctionsTbl   
     actsmodule = IntentsFunctionsTbl[acid]
     try:
         actFunction = getattr(actsmodule,intent)
-        result = actFunction(acid,username,userinput,matches)
+        if _wantsDialogInput(actFunction):
+            if dlginput==None:
+                dlginput = DialogInput(userinput,_getTokenizer(acid))
+            result = actFunction(acid,username,userinput,matches,dlginput=dlginput)
+        else:
+            result = actFunction(acid,username,userinput,matches)
     except Exception as error:
         ac.print_dbg('dc','Conversation action error ', error)
         result = None  
     #DTLock.release()
     return result
 
-def _applyProdRules(acid,username,userinput):
-    global ProdRulesTbl    
+def _applyProdRules(acid,username,dlginput):
+    global ProdRulesTbl, ProdRulesMatcherTbl
     prods = ProdRulesTbl[acid]
     if prods==None:
         return None
-    tkstrinput = _toTokenString( nltk.word_tokenize(userinput.lower()) )
-    for pr in prods:
-        hear_patts = pr['hear']
-        if hear_patts==None:
+    matcher = ProdRulesMatcherTbl.get(acid)
+    if matcher==None or matcher.prods is not prods or matcher.nprods!=len(prods):
+        # Rules changed since the matcher was built
+        matcher = ProdRulesMatcher(prods)
+        ProdRulesMatcherTbl[acid] = matcher
+    tkstrinput = dlginput.tkstr
+    # Only check the hear patterns with all required literal tokens present
+    # in the input, in the order of the rules
+    for cand in matcher.index.candidates(dlginput.tkset):
+        prodnum, origpatt, patt, cpatt = matcher.entries[cand]
+        pr = prods[prodnum]
+        ac.print_dbg('dc','matching hear: ',origpatt,' with: ',tkstrinput)
+        hits = _rawTokenMatcher(acid, tkstrinput, patt, cpatt)
+        if len(hits)==0:
             continue
-        for patt in hear_patts:
-            ac.print_dbg('dc','matching hear: ',patt,' with: ',tkstrinput)
-            hits = _tokenMatcher(acid, tkstrinput, patt)
-            if len(hits)==0:
-                continue
-            matches = hits[0] if isinstance(hits[0],list) else [hits[0]]
-            ac.print_dbg('dc','matches: ',matches)
-            # Check if it is a list or a string and take a copy of what is to talk
-            talks = pr['talk']
-            if isinstance(talks,list):
-                talk=str(random.choice(talks))
-            else:
-                talk = str(talks)
-            ac.print_dbg('dc','talk0: ',talk)
-            # Process memory variables '... {mem-var1} ... {mem-var2} ...'
-            try:
-                memvarnames = re.findall("\{([a-zA-Z][-a-zA-Z0-9]*)\}",talk)
-                ac.print_dbg('dc','memvarnames=', memvarnames)
-                for memvarname in memvarnames:
-                    if memvarname=='username':
-                        talk = talk.replace('{username}',username)
-                    else:
-                        memvar = ac.remember(acid,[memvarname])
-                        ac.print_dbg('dc','memvar=', memvar)
-                        if memvar!=None and memvar[1]!=None:
-                            talk = talk.replace('{'+memvarname+'}',str(memvar[1]))
-            except Exception as error:
-                ac.print_dbg('dc','prod rules mem var error ', error)
-            ac.print_dbg('dc','talk1: ',talk)
-            # Process extracted fields '... {0} ... {1} ...'
-            try:
-                talk = talk.format(*matches)
-            except Exception as error1:
-                ac.print_dbg('dc','prod rules extract field error ', error1)
-            ac.print_dbg('dc','talk2: ',talk)
-            return talk
+        matches = hits[0] if isinstance(hits[0],list) else [hits[0]]
+        ac.print_dbg('dc','matches: ',matches)
+        # Check if it is a list or a string and take a copy of what is to talk
+        talks = pr['talk']
+        if isinstance(talks,list):
+            talk=str(random.choice(talks))
+        else:
+            talk = str(talks)
+        ac.print_dbg('dc','talk0: ',talk)
+        # Process memory variables '... {mem-var1} ... {mem-var2} ...'
+        try:
+            memvarnames = re.findall("\{([a-zA-Z][-a-zA-Z0-9]*)\}",talk)
+            ac.print_dbg('dc','memvarnames=', memvarnames)
+            for memvarname in memvarnames:
+                if memvarname=='username':
+                    talk = talk.replace('{username}',username)
+                else:
+                    memvar = ac.remember(acid,[memvarname])
+                    ac.print_dbg('dc','memvar=', memvar)
+                    if memvar!=None and memvar[1]!=None:
+                        talk = talk.replace('{'+memvarname+'}',str(memvar[1]))
+        except Exception as error:
+            ac.print_dbg('dc','prod rules mem var error ', error)
+        ac.print_dbg('dc','talk1: ',talk)
+        # Process extracted fields '... {0} ... {1} ...'
+        try:
+            talk = talk.format(*matches)
+        except Exception as error1:
+            ac.print_dbg('dc','prod rules extract field error ', error1)
+        ac.print_dbg('dc','talk2: ',talk)
+        return talk
     return None
 
 #*******************************************
@@ -1330,6 +1799,14 @@ def set_dialog_intents_file(acid, intentsfile):
     
     Intent functions return a string to be sent back to the user.
     
+    Intent functions that also need the tokens of the user input can be 
+    defined with an additional dlginput argument:
+        intent_name(acid,username,userinput,matches,dlginput)
+    where dlginput is the DialogInput object built by process_dialog_input() 
+    for the current input, with the lowercase input text (lowertext), the 
+    list of tokens of this text (tokens) and the token string (tkstr) used 
+    by the token matcher, so the input do not need to be tokenized again.
+    
     Args:
         acid: str with unique global identifier of actor.
         intentsfile: name of Python module with functions that implement dialog 
@@ -1467,6 +1944,59 @@ def set_dialog_aiml_files(acid, aimlfiles):
     AIMLFiles[acid] = aimlfiles
     return True
 
+def set_dialog_tokenizer(acid, tokenizer):
+    """ All NNL dialog processors, except the AIML interpreter, work on 
+    the list of tokens of the user input. The input text is lowercased 
+    and split in tokens by the tokenizer of the actor, which can be 
+    selected by this function at any time, and will be used from the 
+    next user input on. 
+    
+    The tokenizer can be one of the following:
+        'nltk':     the nltk.word_tokenize() function, which is the default
+                    tokenizer. It is accurate, but nltk and its punkt model 
+                    are slow to load and use a lot of memory.
+        'regex':    a lightweight tokenizer, based on a single regular 
+                    expression, that splits lowercase chat input in 
+                    Portuguese or English in the same tokens produced by 
+                    nltk.word_tokenize() with the english punkt model. 
+                    The differences are: only the abbreviations listed 
+                    in the RegexTokenizerAbbrevs global set keep their 
+                    periods (as in 'dr.'), while the punkt model has its 
+                    own list of abbreviations, learned from English text;
+                    and input with unusual sequences of punctuation marks,
+                    like quotes, colons or hyphens next to other marks 
+                    (as in ',:' or '."('), can be split differently. The
+                    CheckDialogTokenizers.py script reports the inputs 
+                    where the tokens and dialog decisions of both 
+                    tokenizers differ.
+    or any Python function that receives a string and returns the list of 
+    tokens (strings) of this string.
+    
+    Note that the token patterns of the patterns to intents and hear-talk 
+    rules files are matched against the tokens produced by the tokenizer. 
+                    
+    Args:
+        acid:  str with unique global identifier of actor.
+        tokenizer:  str with the name of tokenizer ('nltk' or 'regex') or 
+            a tokenizer function
+                        
+    Returns:
+     
+        On fail, returns False.     
+        On success, configure the tokenizer used by the NNL dialog system 
+            and returns True.            
+    """    
+    global DialogTokenizer  
+    if isinstance(tokenizer,str):
+        valid = tokenizer in DialogTokenizers
+    else:
+        valid = callable(tokenizer)
+    if not valid:
+        ac.print_dbg('dc','Unknown dialog tokenizer ',tokenizer)
+        return False
+    DialogTokenizer[acid] = tokenizer
+    return True
+
 
 def set_dialog_speeches_file(acid, speechesfile):
     """ The NNL dialog system provides a service that can be used by 
@@ -1583,7 +2113,8 @@ def init_dialog_system(acid):
         On success, initialize and start the NNL dialog system and returns True.            
     """    
     global IntentsPatternsFile, IntentsFunctionsFile, ProdRulesFile, SpeechesFile
-    global IntentsPatternsTbl, IntentsFunctionsTbl, DlgProdsRulesTbl 
+    global IntentsPatternsTbl, IntentsMatcherTbl, IntentsFunctionsTbl, DlgProdsRulesTbl 
+    global ProdRulesMatcherTbl
     global SpeechesTbl, AIMLFiles, AIMLKrnlTbl 
     global CurrDiscussTopic, CurrInputMode
 
@@ -1612,6 +2143,7 @@ def init_dialog_system(acid):
         return False 
     #DTLock.acquire()
     IntentsPatternsTbl[acid] = patterns
+    IntentsMatcherTbl[acid] = _buildIntentsMatcher(patterns)
     IntentsFunctionsTbl[acid] = intentsmod
     #DTLock.release()
 
@@ -1631,6 +2163,7 @@ def init_dialog_system(acid):
         prods=_loadProdRules(ProdRulesFile.get(acid))
         if prods!=None:
             ProdRulesTbl[acid] = prods
+            ProdRulesMatcherTbl[acid] = ProdRulesMatcher(prods)
             ac.print_dbg('dc','Dialog production rules file loaded')
         else:
             ac.print_dbg('dc','Cannot load dialog production rules file')
@@ -1698,13 +2231,15 @@ def process_dialog_input(acid,username,userinput):
     global IntentsPatternsTbl, IntentsFunctionsTbl, AIMLKrnlTbl, LastDlgProc
     #global RecIntents
     LastDlgProc[acid]=None
+    # Lowercase and tokenize the user input once for all processors
+    dlginput = DialogInput(userinput,_getTokenizer(acid))
     # First check if user input match some intent pattern
-    intent = _findIntent(acid,username,userinput)
+    intent = _findIntent(acid,username,dlginput)
     ac.print_dbg('dc','_findIntent=',intent)
     if intent!=None:
         # Found intent pattern, execute corresponding intent function
         was_recording_intents = is_recording_intents(acid)
-        resp = _execIntentAction(acid,username,userinput,intent[0],intent[1])
+        resp = _execIntentAction(acid,username,userinput,intent[0],intent[1],dlginput)
         if was_recording_intents>0 and is_recording_intents(acid)>0:
             # Was recording intentions before and after the execution
             # of the intention, thus record this intention
@@ -1727,7 +2262,7 @@ def process_dialog_input(acid,username,userinput):
     else:
         # No intention was found in user input, now check if some
         # hear-talk production rule can be applied to this input
-        resp = _applyProdRules(acid,username,userinput)
+        resp = _applyProdRules(acid,username,dlginput)
         if resp!=None:
             # Register that last input was processed by some hear-talk prod. rule
             LastDlgProc[acid]='NNL-HTP'
@@ -1759,6 +2294,14 @@ def process_dialog_input(acid,username,userinput):
         reset_topic(acid)
     ac.print_dbg('dc','handled topic')
     return resp
+
+async def async_process_dialog_input(acid,username,userinput):
+    """ Coroutine version of process_dialog_input(), to be awaited in an 
+    asyncio event loop. The input is processed in the thread pool of the 
+    asyncio facade of ActorController, see process_dialog_input() for args
+    and results.
+    """
+    return await ac.async_action(acid,process_dialog_input,acid,username,userinput)
         
 #*******************************************
 # INTERFACE FUNCTIONS TO HEAR-TALK 
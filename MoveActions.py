@@ -49,6 +49,7 @@
         tele_to_landmark(acid, landmark)
         tele_to_rgn(acid, rgn, x, y, z=None)
         walk_to(acid, x, y, z=None)
+        async_walk_to(acid, x, y, z=None)
 
 """
 
@@ -500,6 +501,15 @@ def walk_to(acid, x, y, z=None):
     except:
         result= False
     return result
+
+async def async_walk_to(acid, x, y, z=None):
+    """ Coroutine version of walk_to(), to be awaited in an asyncio event 
+        loop, see walk_to() for args and results.
+    """
+    result = await ac.async_action(acid,walk_to,acid,x,y,z)
+    if result==None:
+        return False
+    return result
     
 #endregion
 
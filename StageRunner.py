@@ -0,0 +1,416 @@
+###############################################################
+###############################################################
+#
+#   VirtualStage Platform - a virtual stage for virtual actors
+#
+#   Copyright (C): 2020-2023, Joao Carlos Gluz
+#   Contact:  João Carlos Gluz (jcgluz@gmail.com)
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#********************************************************
+#
+#   Module:     StageRunner
+#   Purpose:    Runs a cast of actors distributed over several
+#               VirtualStage worker processes
+#   Author:     João Carlos Gluz
+#
+###############################################################
+###############################################################
+
+""" Module StageRunner - runs a cast of actors distributed over several
+        VirtualStage worker processes, so heavy actors (for instance, with
+        large dialog systems) do not stall the other actors of the stage.
+
+    A cast is a list of actor definitions, each definition is a dict with
+    the keys:
+        'first_name', 'last_name', 'password': name and password of the
+            VR avatar controlled by the actor,
+        'vr_server_url': the URL of OpenSim VR simulator,
+        'script_module': name of Python module with the script of actor,
+        'script': name of the function that implements the initial script
+            of actor (see start_actor()),
+        'start_loc': optional, starting location of avatar,
+        'extra_args': optional, list with additional args of the script.
+    A cast can also be read from a JSON file with load_cast(castfile).
+
+    The actors of the cast are distributed over N worker processes, each
+    worker starts its actors with start_actors() and runs until all its
+    actors stop. The runner supervises workers: a worker that crashes (ends
+    with exit code different than 0) is restarted up to max_restarts times.
+    The output of workers (print(), tracebacks, etc.) is sent to the parent,
+    printed with the worker number and optionally saved in a log file,
+    workers also send their metrics periodically to the parent.
+
+    Comms between actors of different workers are sent through the comm
+    transport of the StageTransport module, using stagedir as directory.
+
+    Example (from the Python console):
+        import StageRunner as sr
+        runner = sr.run_stage(sr.load_cast('hospital.json'), nworkers=4)
+        ...
+        runner.get_metrics()
+        runner.stop()
+
+    Functions:
+        load_cast(castfile)
+        run_stage(cast, nworkers=None, stagedir=None, logfile=None,
+                    restart=True, max_restarts=3)
+    Classes:
+        StageRunner(cast, nworkers=None, stagedir=None, logfile=None,
+                    restart=True, max_restarts=3)
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import tempfile
+import threading
+import importlib
+import multiprocessing
+
+# Period, in seconds, of the metrics sent by workers to the parent
+MetricsPeriod = 5.0
+
+# Max time, in seconds, to wait for workers to stop
+StopTimeout = 10.0
+
+def load_cast(castfile):
+    """ Load a cast definition from a JSON file, the file must contain a
+        list with the definition of actors (see module help).
+
+    Args:
+        castfile:   path of JSON file.
+
+    Returns:
+        On fail, returns None.
+        On success, returns the list with the definition of actors.
+    """
+    try:
+        with open(castfile,encoding='utf-8') as jsonfile:
+            cast = json.load(jsonfile)
+    except (OSError, ValueError) as exc:
+        print('load_cast() failed -',repr(exc))
+        return None
+    if type(cast) is not list:
+        return None
+    return cast
+
+#*******************************************
+# WORKER PROCESS
+#*******************************************
+
+class _QueueWriter:
+    # Replaces stdout/stderr of workers, sending each line to the parent
+    def __init__(self, outq, workerid):
+        self.outq = outq
+        self.workerid = workerid
+        self.buffer = ''
+
+    def write(self, text):
+        self.buffer += text
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n',1)
+            self.outq.put(('log',self.workerid,line))
+        return len(text)
+
+    def flush(self):
+        if self.buffer!='':
+            self.outq.put(('log',self.workerid,self.buffer))
+            self.buffer = ''
+
+def _actorSpec(actordef):
+    module = importlib.import_module(actordef['script_module'])
+    script = getattr(module,actordef['script'])
+    extra_args = actordef.get('extra_args')
+    if extra_args!=None:
+        extra_args = tuple(extra_args)
+    return { 'first_name':actordef['first_name'],
+             'last_name':actordef['last_name'],
+             'password':actordef['password'],
+             'vr_server_url':actordef['vr_server_url'],
+             'start_loc':actordef.get('start_loc'),
+             'init_script':script,
+             'extra_args':extra_args }
+
+def _workerMetrics(ac, acids):
+    metrics = {'pid':os.getpid(), 'time':time.time(), 'actors':{}}
+    for acid in acids:
+        acname = ac.get_actor_name(acid)
+        if acname==None:
+            continue
+        metrics['actors'][acname] = { 'acid':acid,
+                    'metrics':ac.get_actor_metrics(acid),
+                    'calls':ac.get_call_stats(acid) }
+    metrics['stage'] = ac.get_stage_metrics()
+    return metrics
+
+def _workerMain(workerid, actordefs, outq, stopev, stagedir, authkey):
+    writer = _QueueWriter(outq,workerid)
+    sys.stdout = writer
+    sys.stderr = writer
+    import ActorController as ac
+    import StageTransport as st
+    st.start_comm_transport(stagedir,authkey)
+    specs = []
+    for actordef in actordefs:
+        try:
+            specs.append(_actorSpec(actordef))
+        except Exception as exc:
+            print('cannot load script of actor',actordef.get('first_name'),
+                    actordef.get('last_name'),'-',repr(exc))
+    results = ac.start_actors(specs,max(1,len(specs)))
+    outq.put(('started',workerid,results))
+    acids = [result['acid'] for result in results if result['ok']]
+    if len(acids)==0:
+        writer.flush()
+        sys.exit(2)
+    # Runs until all actors of worker stop or the stage is stopped
+    lastmetrics = 0.0
+    while not stopev.is_set():
+        if all(ac.get_actor_name(acid)==None for acid in acids):
+            break
+        if time.monotonic()-lastmetrics>=MetricsPeriod:
+            outq.put(('metrics',workerid,_workerMetrics(ac,acids)))
+            lastmetrics = time.monotonic()
+        stopev.wait(0.5)
+    metrics = _workerMetrics(ac,acids)
+    if len(metrics['actors'])>0:
+        outq.put(('metrics',workerid,metrics))
+    for acid in acids:
+        ac.stop_actor(acid)
+    st.stop_comm_transport()
+    writer.flush()
+
+#*******************************************
+# STAGE RUNNER
+#*******************************************
+
+class WorkerDescr:
+    """__init__() class constructor"""
+    def __init__(self, workerid, actordefs):
+        self.workerid = workerid
+        self.actordefs = actordefs
+        self.process = None
+        self.restarts = 0
+        self.exitcode = None
+        self.results = None
+        self.metrics = None
+
+class StageRunner:
+    """ Runs a cast of actors over several worker processes, see module
+        help. """
+    def __init__(self, cast, nworkers=None, stagedir=None, logfile=None,
+                restart=True, max_restarts=3):
+        if nworkers==None:
+            nworkers = os.cpu_count() or 1
+        nworkers = max(1,min(nworkers,len(cast)))
+        if stagedir==None:
+            stagedir = tempfile.mkdtemp(prefix='virtualstage-')
+        self.stagedir = stagedir
+        self.authkey = os.urandom(16)
+        self.logfile = logfile
+        self.restart = restart
+        self.max_restarts = max_restarts
+        self.lock = threading.Lock()
+        self.loglock = threading.Lock()
+        self.ctx = multiprocessing.get_context('spawn')
+        self.outq = self.ctx.Queue()
+        self.stopev = self.ctx.Event()
+        self.logs = []
+        self.running = False
+        # Actors are distributed round robin over workers
+        self.workers = [WorkerDescr(wid,cast[wid::nworkers]) for wid in range(nworkers)]
+        self.collectthr = None
+        self.supervthr = None
+
+    def start(self):
+        """ Start the worker processes """
+        with self.lock:
+            if self.running:
+                return False
+            self.running = True
+            self.stopev.clear()
+            for worker in self.workers:
+                self._startWorker(worker)
+        self.collectthr = threading.Thread(target=self._collectThread,
+                            name='stage runner collect thread', daemon=True)
+        self.collectthr.start()
+        self.supervthr = threading.Thread(target=self._superviseThread,
+                            name='stage runner supervise thread', daemon=True)
+        self.supervthr.start()
+        return True
+
+    def stop(self, timeout=None):
+        """ Stop all actors and worker processes, workers that do not stop
+            in timeout seconds (StopTimeout if None) are terminated """
+        if timeout==None:
+            timeout = StopTimeout
+        with self.lock:
+            self.running = False
+            self.stopev.set()
+        deadline = time.monotonic()+timeout
+        for worker in self.workers:
+            process = worker.process
+            if process==None:
+                continue
+            process.join(max(0.0,deadline-time.monotonic()))
+            if process.is_alive():
+                self._log(worker.workerid,'worker did not stop, terminating it')
+                process.terminate()
+                process.join()
+            worker.exitcode = process.exitcode
+        return True
+
+    def wait(self, timeout=None):
+        """ Wait until all workers finish, returns False on timeout """
+        deadline = None if timeout==None else time.monotonic()+timeout
+        while True:
+            with self.lock:
+                # Exit code of workers is set by supervisor, after it
+                # decides if they must be restarted
+                if all(w.exitcode!=None for w in self.workers):
+                    return True
+            if deadline!=None and time.monotonic()>=deadline:
+                return False
+            time.sleep(0.2)
+
+    def is_running(self):
+        """ Returns True if some worker is running """
+        with self.lock:
+            return any(w.process!=None and w.process.is_alive() for w in self.workers)
+
+    def get_worker_status(self):
+        """ Returns a list with the status of each worker: a dict with keys
+            'worker', 'pid', 'alive', 'exitcode', 'restarts', 'actors' and
+            'started' (the results of start_actors() in the worker) """
+        with self.lock:
+            return [ { 'worker':w.workerid,
+                       'pid':w.process.pid if w.process!=None else None,
+                       'alive':w.process!=None and w.process.is_alive(),
+                       'exitcode':w.exitcode, 'restarts':w.restarts,
+                       'actors':[a['first_name']+' '+a['last_name'] for a in w.actordefs],
+                       'started':w.results } for w in self.workers ]
+
+    def get_metrics(self):
+        """ Returns the last metrics sent by each worker, aggregated in a
+            dict with keys 'workers' (metrics of each worker) and 'actors'
+            (metrics of all actors, by actor name) """
+        with self.lock:
+            workers = {w.workerid:w.metrics for w in self.workers}
+        actors = {}
+        for metrics in workers.values():
+            if metrics!=None:
+                actors.update(metrics['actors'])
+        return {'workers':workers, 'actors':actors}
+
+    def get_logs(self, maxlines=None):
+        """ Returns the last lines of the aggregated log of workers """
+        with self.loglock:
+            if maxlines==None:
+                return list(self.logs)
+            return self.logs[-maxlines:]
+
+    def _startWorker(self, worker):
+        # Must be called with self.lock acquired
+        worker.exitcode = None
+        worker.process = self.ctx.Process(target=_workerMain,
+                            name='VirtualStage worker '+str(worker.workerid),
+                            args=(worker.workerid,worker.actordefs,self.outq,
+                                  self.stopev,self.stagedir,self.authkey))
+        worker.process.start()
+
+    def _superviseThread(self):
+        while True:
+            with self.lock:
+                if not self.running:
+                    return
+                for worker in self.workers:
+                    process = worker.process
+                    if process.is_alive() or worker.exitcode!=None:
+                        continue
+                    worker.exitcode = process.exitcode
+                    if worker.exitcode in (0,2):
+                        # Actors finished (or none could be started)
+                        continue
+                    if self.restart and worker.restarts<self.max_restarts:
+                        worker.restarts += 1
+                        self._log(worker.workerid,'worker crashed with exit code '+
+                                    str(worker.exitcode)+', restarting it')
+                        self._startWorker(worker)
+                    else:
+                        self._log(worker.workerid,'worker crashed with exit code '+
+                                    str(worker.exitcode))
+            time.sleep(0.5)
+
+    def _collectThread(self):
+        while True:
+            try:
+                kind, workerid, data = self.outq.get(timeout=0.5)
+            except queue.Empty:
+                if not self.running and not self.is_running():
+                    return
+                continue
+            if kind=='log':
+                self._log(workerid,data)
+            elif kind=='metrics':
+                with self.lock:
+                    self.workers[workerid].metrics = data
+            elif kind=='started':
+                with self.lock:
+                    self.workers[workerid].results = data
+                for result in data:
+                    self._log(workerid,'actor '+str(result['acname'])+
+                        (' started' if result['ok'] else ' failed: '+str(result['error'])))
+
+    def _log(self, workerid, text):
+        line = '[worker '+str(workerid)+'] '+str(text)
+        with self.loglock:
+            self.logs.append(line)
+            if len(self.logs)>10000:
+                del self.logs[:1000]
+        print(line)
+        if self.logfile!=None:
+            try:
+                with open(self.logfile,'a',encoding='utf-8') as logfile:
+                    logfile.write(time.strftime('%Y-%m-%d %H:%M:%S ')+line+'\n')
+            except OSError:
+                pass
+
+def run_stage(cast, nworkers=None, stagedir=None, logfile=None, restart=True,
+                max_restarts=3):
+    """ Start a cast of actors distributed over worker processes.
+
+    Args:
+        cast:       list with the definition of actors (see module help).
+        nworkers:   number of worker processes, if None uses the number of
+                    CPU cores (never more workers than actors).
+        stagedir:   directory used by the comm transport between workers, if
+                    None a temporary directory is created.
+        logfile:    if different than None, the aggregated log of workers is
+                    also appended to this file.
+        restart:    if True, workers that crash are restarted.
+        max_restarts: max number of restarts of each worker.
+
+    Returns:
+        On fail, returns None.
+        On success, returns the StageRunner object controlling the workers.
+    """
+    if type(cast) is not list or len(cast)==0:
+        return None
+    runner = StageRunner(cast,nworkers,stagedir,logfile,restart,max_restarts)
+    runner.start()
+    return runner
@@ -0,0 +1,235 @@
+###############################################################
+###############################################################
+#
+#   VirtualStage Platform - a virtual stage for virtual actors
+#
+#   Copyright (C): 2020-2023, Joao Carlos Gluz
+#   Contact:  João Carlos Gluz (jcgluz@gmail.com)
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#********************************************************
+#
+#   Module:     StageTransport
+#   Purpose:    Transport of comms between actors running in
+#               different VirtualStage processes of the same host
+#   Author:     João Carlos Gluz
+#
+###############################################################
+###############################################################
+
+""" Module StageTransport - transport of comms between actors running
+        in different VirtualStage processes of the same host.
+        
+    Each VirtualStage process listens for comms in a local connection (a
+    named pipe on Windows, an UNIX socket on other systems), provided by
+    the multiprocessing.connection module. A directory service, kept in a 
+    directory shared by all processes of the stage, maps the ID of each 
+    actor (acid) to the address of the process that runs it.
+    
+    To use the transport, each process must call:
+        start_comm_transport(stagedir, authkey)
+    after that, send_comm(), wait_comm() and seek_comms() of ActorController
+    work unchanged when the destination actor runs in a sibling process.
+    Communication channels (publish_comm()) are still local to each process.
+    
+    Comms are sent pickled, and unpickling data from an unknown peer can run
+    arbitrary code, so connections are authenticated with authkey. There is
+    no default key: a random key must be generated for each run of the stage
+    (for instance with os.urandom(16), as StageRunner does) and passed only
+    to the processes of the stage.
+    
+    Functions:
+        start_comm_transport(stagedir, authkey)
+        stop_comm_transport()
+        lookup_actor_address(stagedir, acid)
+    Classes:
+        PipeCommTransport(stagedir, authkey)
+"""
+
+import os
+import json
+import threading
+from multiprocessing.connection import Listener, Client
+import ActorController as ac
+
+def _actorFile(stagedir, acid):
+    return os.path.join(stagedir,acid+'.addr')
+
+def lookup_actor_address(stagedir, acid):
+    """ Get the address of the VirtualStage process that runs the actor,
+        from the directory service of the stage.
+
+    Args:
+        stagedir:   directory shared by the processes of the stage.
+        acid:       str with unique global identifier of actor.
+
+    Returns:     
+        On fail, returns None.
+        On success, returns the address of the process.
+    """
+    try:
+        with open(_actorFile(stagedir,acid)) as addrfile:
+            return json.load(addrfile)['address']
+    except (OSError, ValueError, KeyError):
+        return None
+
+class PipeCommTransport:
+    """ Comm transport of ActorController based on multiprocessing 
+        connections and on a directory service kept in stagedir. """
+    def __init__(self, stagedir, authkey):
+        if type(authkey) is not bytes or len(authkey)==0:
+            raise ValueError('authkey must be a non empty bytes object')
+        os.makedirs(stagedir,exist_ok=True)
+        self.stagedir = stagedir
+        self.authkey = authkey
+        self.lock = threading.Lock()
+        self.listener = Listener(authkey=authkey)
+        self.address = self.listener.address
+        self.actors = set()
+        self.addresses = {}
+        self.clients = {}
+        self.closed = False
+        self.acceptthr = threading.Thread(target=self._acceptThread,
+                            name='comm transport accept thread', daemon=True)
+        self.acceptthr.start()
+
+    def register_actor(self, acid):
+        """ Publish the address of this process for the actor """
+        tmpfile = _actorFile(self.stagedir,acid)+'.'+str(os.getpid())
+        with open(tmpfile,'w') as addrfile:
+            json.dump({'address':self.address, 'pid':os.getpid()},addrfile)
+        os.replace(tmpfile,_actorFile(self.stagedir,acid))
+        with self.lock:
+            self.actors.add(acid)
+
+    def unregister_actor(self, acid):
+        """ Remove the actor from the directory service """
+        with self.lock:
+            self.actors.discard(acid)
+        if lookup_actor_address(self.stagedir,acid)==self.address:
+            try:
+                os.remove(_actorFile(self.stagedir,acid))
+            except OSError:
+                pass
+
+    def send_comm(self, dstacid, acmsg):
+        """ Send comm to actor running in other process, returns False if 
+            the actor is unknown or the comm could not be sent """
+        # The address of actor is cached, on failure it is read again 
+        # from directory service (actor can be restarted in other process)
+        for retry in (False,True):
+            with self.lock:
+                address = self.addresses.get(dstacid)
+            if address==None or retry:
+                address = lookup_actor_address(self.stagedir,dstacid)
+                if address==None or address==self.address:
+                    return False
+                with self.lock:
+                    self.addresses[dstacid] = address
+            try:
+                conn, connlock = self._client(address)
+                with connlock:
+                    conn.send((dstacid,tuple(acmsg)))
+                return True
+            except (OSError, EOFError) as exc:
+                ac.print_dbg('ac','comm transport - cannot send to: '+dstacid+' '+repr(exc))
+                self._dropClient(address)
+        return False
+
+    def close(self):
+        """ Stop the transport, removing local actors from directory """
+        with self.lock:
+            self.closed = True
+            actors = list(self.actors)
+            clients = list(self.clients.values())
+            self.clients = {}
+        for acid in actors:
+            self.unregister_actor(acid)
+        for conn, connlock in clients:
+            conn.close()
+        self.listener.close()
+
+    def _client(self, address):
+        with self.lock:
+            client = self.clients.get(address)
+        if client!=None:
+            return client
+        client = (Client(address,authkey=self.authkey), threading.Lock())
+        with self.lock:
+            oldclient = self.clients.setdefault(address,client)
+        if oldclient is not client:
+            client[0].close()
+        return oldclient
+
+    def _dropClient(self, address):
+        with self.lock:
+            client = self.clients.pop(address,None)
+        if client!=None:
+            client[0].close()
+
+    def _acceptThread(self):
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except Exception:
+                # Listener closed or authentication of client failed
+                if self.closed:
+                    return
+                continue
+            threading.Thread(target=self._recvThread, args=(conn,),
+                            name='comm transport recv thread', daemon=True).start()
+
+    def _recvThread(self, conn):
+        try:
+            while True:
+                dstacid, acmsg = conn.recv()
+                if not ac.deliver_remote_comm(dstacid,acmsg):
+                    ac.print_dbg('ac','comm transport - cannot deliver to: '+str(dstacid))
+        except (OSError, EOFError):
+            pass
+        finally:
+            conn.close()
+
+def start_comm_transport(stagedir, authkey):
+    """ Start the comm transport of this VirtualStage process, so actors 
+        can exchange comms with actors of other processes that use the same
+        stagedir.
+
+    Args:
+        stagedir:   directory shared by the processes of the stage, used by
+                    directory service.
+        authkey:    bytes with the key used to authenticate connections 
+                    between processes of the stage, must be a random key
+                    generated for each run, like os.urandom(16).
+
+    Returns:     
+        On fail, returns None.
+        On success, returns the transport.
+    """
+    try:
+        transport = PipeCommTransport(stagedir,authkey)
+    except (OSError, ValueError) as exc:
+        ac.print_dbg('ac','start_comm_transport() failed - '+repr(exc))
+        return None
+    ac.set_comm_transport(transport)
+    return transport
+
+def stop_comm_transport():
+    """ Stop the comm transport of this VirtualStage process.
+
+    Returns:     
+        Returns True.
+    """
+    return ac.set_comm_transport(None)
@@ -164,7 +164,8 @@ def set_log_level(acid,level):
 
 def pause_for(acid, seconds):
     """ Makes actor's avatar sleeps (stops operation) for a given 
-        number of seconds.
+        number of seconds. If the current script is cancelled or reaches
+        its deadline, the avatar wakes up before the end of the sleep.
 
     Args:
         acid:       str with unique global identifier of actor;
@@ -177,9 +178,34 @@ def pause_for(acid, seconds):
     """
     try:
         agent = ac.get_agctl(acid)
-        return agent.SelfModActs.SleepAction(seconds)
-    except:
+        if ac.get_script_token(acid)==None:
+            return agent.SelfModActs.SleepAction(seconds)
+        seconds = int(seconds)
+        # VRAgents.dll builds without BeginSleepAction()/EndSleepAction() 
+        # can only make the whole sleep, which is not cancellable
+        if not hasattr(agent.SelfModActs,'BeginSleepAction'):
+            ac.print_dbg('ac','pause_for: VRAgents.dll without BeginSleepAction(), sleep of ',
+                        acid,' is not cancellable')
+            return agent.SelfModActs.SleepAction(str(seconds))
+        # Sleep of cancellable scripts is done here, between the pause and
+        # the resume of the avatar. Each sleep has its own serial number, 
+        # so other scripts of the actor can also sleep at the same time
+        serialnum = agent.SelfModActs.BeginSleepAction()
+        if serialnum==None:
+            return False
+    except Exception as exc:
+        ac.print_dbg('ac','pause_for: sleep of ',acid,' failed: ',exc)
+        return False
+    try:
+        return ac.sleep_script(acid,seconds)
+    except Exception as exc:
+        ac.print_dbg('ac','pause_for: sleep of ',acid,' failed: ',exc)
         return False
+    finally:
+        try:
+            agent.SelfModActs.EndSleepAction(serialnum)
+        except Exception as exc:
+            ac.print_dbg('ac','pause_for: resume of ',acid,' failed: ',exc)
 
 
 def pause(acid):
@@ -38,7 +38,6 @@ import time
 import re
 import uuid
 import math
-import nltk
 import ActorController as ac
 import DialogController as dc
 import AtorAprendiz
@@ -55,10 +54,25 @@ def entreModoAprenderPerguntaResposta(acid,username,userinput,matches):
     return resp
 
 
-def entreComPergunta(acid,username,userinput,matches):
+# Tokens of the question informed by the user, reused when the question is
+# converted to a token pattern, so the question is not tokenized again
+QuestionTokens = {}
+
+def _rememberQuestionTokens(acid,question,dlginput):
+    # The question captured by the intent pattern ends the user input, so
+    # its tokens are the last tokens of the input
+    tklst = dlginput.tokens[-len(question.split(" ")):]
+    if " ".join(tklst)==question:
+        QuestionTokens[acid] = (question,tklst)
+    else:
+        QuestionTokens.pop(acid,None)
+
+
+def entreComPergunta(acid,username,userinput,matches,dlginput):
     if len(matches)==0:
         resp=dc.gen_speak(acid,'naoFalouPergunta')
     else:
+        _rememberQuestionTokens(acid,matches[0],dlginput)
         dc.set_next_topic(acid,'learning-question',matches[0])
         dc.set_mode(acid,'modo-aprender-resposta')
         resp=dc.gen_speak(acid,'vouLembrarPergunta(QUESTAO)',[matches[0]],"Aprendi pergunta")+"\n"    
@@ -66,13 +80,15 @@ def entreComPergunta(acid,username,userinput,matches):
     return resp
 
 
-def wordsToTokenString(wrds):
-    tklst = nltk.word_tokenize(wrds)
+def wordsToTokenString(acid,wrds):
+    question, tklst = QuestionTokens.get(acid,(None,None))
+    if question!=wrds:
+        tklst = dc._getTokenizer(acid)(wrds)
     return "".join("<" + wrd + ">" for wrd in tklst)
 
 
-def wordsPatternToTokenPattern(wrdpatt):
-    patt = wordsToTokenString(wrdpatt)
+def wordsPatternToTokenPattern(acid,wrdpatt):
+    patt = wordsToTokenString(acid,wrdpatt)
     patt = re.sub(r'<\[><([^>]+?)><\]>',r'<\1>?',patt)
     patt = patt.replace('<_><*>','<.+>')
     patt = patt.replace('_','&%')
@@ -105,7 +121,7 @@ def entreComResposta(acid,username,userinput,matches):
     if len(matches)==0:
         resp=dc.gen_speak(acid,'naoFalouResposta')
         return resp
-    patt = wordsPatternToTokenPattern(question)
+    patt = wordsPatternToTokenPattern(acid,question)
     ac.print_dbg('dlgctl','question=',question,' patt=',patt,' answer=',matches[0])
     dc.add_hear_talk_rule(acid,[patt],matches[0])
     resp=dc.gen_speak(acid,'aprendiPerguntaResposta(QUESTAO;RESP)',[question,matches[0]],"Aprendi bate-papo")+"\n"
@@ -114,10 +130,11 @@ def entreComResposta(acid,username,userinput,matches):
     return resp
 
 
-def aprendaPergunta(acid,username,userinput,matches):
+def aprendaPergunta(acid,username,userinput,matches,dlginput):
     if len(matches)==0:
         resp=dc.gen_speak(acid,'naoFalouPergunta')
     else:
+        _rememberQuestionTokens(acid,matches[0],dlginput)
         dc.set_next_topic(acid,'learning-question',matches[0])
         resp=dc.gen_speak(acid,'vouLembrarPergunta(QUESTAO)',[matches[0]],"Aprendi pergunta")+"\n"    
         resp+=dc.gen_speak(acid,'informeResposta')+":"
@@ -131,7 +148,7 @@ def aprendaResposta(acid,username,userinput,matches):
         return dc.gen_speak(acid,'naoFalouPergunta')+" "+dc.gen_speak(acid,'sinonAntes')
     if len(matches)==0:
         return dc.gen_speak(acid,'naoFalouResposta')
-    patt = wordsPatternToTokenPattern(question)
+    patt = wordsPatternToTokenPattern(acid,question)
     ac.print_dbg('dlgctl','question=',question,' patt=',patt,' answer=',matches[0])
     dc.add_hear_talk_rule(acid,[patt],matches[0])
     resp=dc.gen_speak(acid,'aprendiPerguntaResposta(QUESTAO;RESP)',[question,matches[0]],"Aprendi bate-papo")+"\n"    
@@ -340,6 +340,15 @@ namespace OpenMetaverse
         }
 
         uint SleepSerialNum = 1;
+        readonly object SleepSerialLock = new object();
+
+        uint NextSleepSerialNum()
+        {
+            // Sleeps can be started by several scripts of the actor at once
+            lock (SleepSerialLock) {
+                return SleepSerialNum++;
+            }
+        }
 
         public bool SleepAction(string argseconds)
         {
@@ -349,7 +358,7 @@ namespace OpenMetaverse
             AgentPausePacket pause = new AgentPausePacket();
             pause.AgentData.AgentID = Agent.Self.AgentID;
             pause.AgentData.SessionID = Agent.Self.SessionID;
-            pause.AgentData.SerialNum = SleepSerialNum++;
+            pause.AgentData.SerialNum = NextSleepSerialNum();
             Agent.Network.SendPacket(pause);
             // Sleep
             System.Threading.Thread.Sleep(seconds * 1000);
@@ -361,6 +370,31 @@ namespace OpenMetaverse
             return VRAgentController.ok("paused");
         }
 
+        // Start a sleep that is ended by EndSleepAction(), returns the serial 
+        // number of this sleep, which must be passed to EndSleepAction()
+        public string BeginSleepAction()
+        {
+            AgentPausePacket pause = new AgentPausePacket();
+            pause.AgentData.AgentID = Agent.Self.AgentID;
+            pause.AgentData.SessionID = Agent.Self.SessionID;
+            pause.AgentData.SerialNum = NextSleepSerialNum();
+            Agent.Network.SendPacket(pause);
+            return VRAgentController.ok("sleeping", pause.AgentData.SerialNum.ToString());
+        }
+
+        public bool EndSleepAction(string argserialnum)
+        {
+            uint serialnum;
+            if (!UInt32.TryParse(argserialnum, out serialnum))
+                return VRAgentController.fail("param 1 error");
+            AgentResumePacket resume = new AgentResumePacket();
+            resume.AgentData.AgentID = Agent.Self.AgentID;
+            resume.AgentData.SessionID = Agent.Self.SessionID;
+            resume.AgentData.SerialNum = serialnum;
+            Agent.Network.SendPacket(resume);
+            return VRAgentController.ok("awake");
+        }
+
 
 
         const int TEXTURE_UPLOAD_TIMEOUT = 1000 * 10;
@@ -166,7 +166,7 @@ namespace OpenMetaverse
                 pause.AgentData.SerialNum = SleepSerialNum++;
                 Agent.Network.SendPacket(pause);
                 return VRAgentController.ok("starting pause)");
-            } else if (argstartstop.ToLower() == "start") {
+            } else if (argstartstop.ToLower() == "stop") {
                 if (LastSleepSerialNum == 0)
                     return VRAgentController.fail("already stopped");
                 AgentResumePacket resume = new AgentResumePacket();
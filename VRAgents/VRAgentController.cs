@@ -119,6 +119,11 @@ namespace OpenMetaverse
         public object DetcdVREventsLock = new object();
         public List<List<string>> DetcdVREvents = new List<List<string>>();
 
+        // Raised each time a new VR message or VR event is stored in 
+        // RecvdVRMsgs or DetcdVREvents lists, this allows Python side 
+        // to be notified about new inbound data instead of polling
+        public event EventHandler InboundArrived;
+
 
         public Dictionary<InstantMessageDialog, string> IMsgNames = 
                     new Dictionary<InstantMessageDialog, string>();
@@ -335,6 +340,7 @@ namespace OpenMetaverse
                 lock (RecvdVRMsgsLock) {
                     RecvdVRMsgs.Add(msg);
                 }
+                SignalInbound();
             } else {
                 string imsgcode;
                 if (!IMsgNames.TryGetValue(msgev.IM.Dialog, out imsgcode))
@@ -364,6 +370,7 @@ namespace OpenMetaverse
                 lock (RecvdVRMsgsLock) {
                     RecvdVRMsgs.Add(msg);
                 }
+                SignalInbound();
             }
         }
 
@@ -408,6 +415,7 @@ namespace OpenMetaverse
             lock (RecvdVRMsgsLock) {
                 RecvdVRMsgs.Add(msg);
             }
+            SignalInbound();
 
         }
 
@@ -426,6 +434,7 @@ namespace OpenMetaverse
             lock (DetcdVREventsLock) {
                 DetcdVREvents.Add(vrev);
             }
+            SignalInbound();
         }
 
         void RegionCrossedEvHandler(object sender, RegionCrossedEventArgs rgncrossev)
@@ -441,6 +450,19 @@ namespace OpenMetaverse
             lock (DetcdVREventsLock) {
                 DetcdVREvents.Add(vrev);
             }
+            SignalInbound();
+        }
+
+        void SignalInbound()
+        {
+            EventHandler handler = InboundArrived;
+            if (handler == null)
+                return;
+            try {
+                handler(this, EventArgs.Empty);
+            } catch (Exception ex) {
+                Logger.Log("InboundArrived handler failed: " + ex.Message, Helpers.LogLevel.Warning, this);
+            }
         }
 
         public void LoginProgressEvHandler(object sender, LoginProgressEventArgs lognprogev)
@@ -91,7 +91,7 @@ namespace OpenMetaverse
         public Dictionary<Simulator, Dictionary<uint, Primitive>> Regions = 
                 new Dictionary<Simulator, Dictionary<uint, Primitive>>();
         public bool GetTextures = false;
-        public volatile int PendingLogins = 0;
+        public int PendingLogins = 0;
         public string onlyAvatar = String.Empty;
 
         public VRAgentManager()
@@ -138,28 +138,40 @@ namespace OpenMetaverse
         public VRAgentController Login(LoginDetails account)
         {
             // Check if this agent is already logged in
-            foreach (VRAgentController ag in Agents.Values)
-            {
-                if (ag.Self.FirstName == account.FirstName && 
-                    ag.Self.LastName == account.LastName)  {
-                    Logout(ag);
-                    break;
+            VRAgentController loggedag = null;
+            lock (Agents) {
+                foreach (VRAgentController ag in Agents.Values)
+                {
+                    if (ag.Self.FirstName == account.FirstName && 
+                        ag.Self.LastName == account.LastName)  {
+                        loggedag = ag;
+                        break;
+                    }
                 }
             }
-            ++PendingLogins;
+            if (loggedag != null)
+                Logout(loggedag);
+            // Logins can run concurrently (from different threads), each
+            // login waits only for its own completion
+            Interlocked.Increment(ref PendingLogins);
+            ManualResetEvent loginDone = new ManualResetEvent(false);
             VRAgentController agent = new VRAgentController(this);
             agent.Network.LoginProgress +=
                 delegate(object sender, LoginProgressEventArgs e)
                 {
                    Logger.Log(String.Format("Login {0}: {1}", e.Status, e.Message), Helpers.LogLevel.Info, agent);
                     if (e.Status == LoginStatus.Success) {
-                        Agents[agent.Self.AgentID] = agent;
+                        lock (Agents) {
+                            Agents[agent.Self.AgentID] = agent;
+                        }
                         Logger.Log("Logged in " + agent.ToString(), Helpers.LogLevel.Info);
-                        --PendingLogins;
+                        Interlocked.Decrement(ref PendingLogins);
+                        loginDone.Set();
                     }  else if (e.Status == LoginStatus.Failed) {
                         Logger.Log("Failed to login " + account.FirstName + " " + account.LastName + ": " +
                                     agent.Network.LoginMessage, Helpers.LogLevel.Warning);
-                        --PendingLogins;
+                        Interlocked.Decrement(ref PendingLogins);
+                        loginDone.Set();
                     }
                 };
             // Optimize the throttle
@@ -175,15 +187,16 @@ namespace OpenMetaverse
             if (!String.IsNullOrEmpty(account.URI))
                 loginParams.URI = account.URI;
           	agent.Network.BeginLogin(loginParams);
-			while (PendingLogins>0)
-				Thread.Sleep(50);
+            loginDone.WaitOne();
             return agent;
         }
 
         public void Logout(VRAgentController agent)
         {
             agent.Network.Logout();
-            Agents.Remove(agent.Self.AgentID);
+            lock (Agents) {
+                Agents.Remove(agent.Self.AgentID);
+            }
         }
 
         // External Interface called by Python/Prolog
@@ -208,10 +221,9 @@ namespace OpenMetaverse
             VRAgentController agent;
             if (!UUID.TryParse(agid, out agUUID))
                 return null;
-            try {
-                agent = Agents[agUUID];
-            } catch (Exception e) {
-                return null;
+            lock (Agents) {
+                if (!Agents.TryGetValue(agUUID, out agent))
+                    return null;
             }
             return agent;
         }